@@ -0,0 +1,82 @@
+"""Compare reading entries one at a time with prefetching them, on a
+simulated network filesystem where every open costs some latency.
+
+    python -m benchmarks.bench_prefetch [number of files] [latency in ms]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from pelican_micropub.prefetch import Prefetcher, read_file
+
+
+def make_tree(path, count):
+    for i in range(count):
+        directory = os.path.join(path, str(i % 10))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'{i}.nd'), 'w') as f:
+            f.write(f'title: Post {i}\n\n' + 'some words ' * 50)
+
+
+def get_files(path):
+    # the way Pelican's Generator.get_files lists them, in a set
+    files = set()
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            files.add(os.path.join(dirpath, name))
+    return files
+
+
+def slow(latency):
+    def read(path):
+        time.sleep(latency)
+        return read_file(path)
+    return read
+
+
+def bench(label, func):
+    start = time.perf_counter()
+    func()
+    print(f'{label:<44} {(time.perf_counter() - start) * 1000:8.1f} ms')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2) / 1000
+    read = slow(latency)
+
+    with tempfile.TemporaryDirectory() as path:
+        make_tree(path, count)
+        # Pelican reads files in set order, and the prefetcher is given
+        # the very same order
+        paths = list(get_files(path))
+
+        def serial(every):
+            def run():
+                for p in paths[::every]:
+                    read(p)
+            return run
+
+        def prefetched(workers, every):
+            def run():
+                prefetcher = Prefetcher(list(get_files(path)),
+                                        workers=workers, read=read)
+                try:
+                    for p in paths[::every]:
+                        if prefetcher.take(p) is None:
+                            read(p)
+                finally:
+                    prefetcher.close()
+            return run
+
+        print(f'{count} files, {latency * 1000:.1f} ms per open')
+        for every, label in [(1, 'all read'), (3, '2/3 in the cache')]:
+            bench(f'serial, {label}', serial(every))
+            for workers in (4, 8, 16):
+                bench(f'prefetched, {workers} workers, {label}',
+                      prefetched(workers, every))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compare get_html with and without sanitization.
+
+    python -m benchmarks.bench_sanitize [number of posts]
+"""
+import sys
+import timeit
+
+from pelican_micropub.micropub import get_html
+from pelican_micropub.sanitize import SanitizeCache, Policy, sanitize
+
+paragraph = '<p>Some <em>text</em> with <a href="https://example.com/{n}" ' \
+    'onclick="track()">a link</a> and <img src="/img/{n}.jpg" alt="x">' \
+    '<script>evil()</script></p>\n'
+
+
+def make_posts(count):
+    return [{
+        'type': ['h-entry'],
+        'properties': {
+            'content': [{'html': paragraph.format(n=n) * 20}],
+        }
+    } for n in range(count)]
+
+
+def bench(label, func, posts):
+    seconds = min(timeit.repeat(lambda: [func(p) for p in posts],
+                                number=1, repeat=3))
+    print(f'{label:<24} {seconds * 1000:8.1f} ms '
+          f'({seconds / len(posts) * 1e6:.1f} us/post)')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    posts = make_posts(count)
+    plain = {}
+    sanitized = {'MICROPUB_SANITIZE_HTML': True}
+    policy = Policy()
+
+    bench('unsanitized', lambda p: get_html(plain, p, 'note'), posts)
+    bench('sanitized, uncached',
+          lambda p: sanitize(get_html(plain, p, 'note'), policy), posts)
+
+    cache = SanitizeCache(maxsize=count)
+    for post in posts:
+        cache.sanitize(get_html(plain, post, 'note'), policy)
+    bench('sanitized, cached',
+          lambda p: cache.sanitize(get_html(plain, p, 'note'), policy), posts)
+
+    bench('get_html, sanitizing', lambda p: get_html(sanitized, p, 'note'),
+          posts)
+
+
+if __name__ == '__main__':
+    main()
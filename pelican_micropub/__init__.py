@@ -1,9 +1,38 @@
-from pelican import signals
-from pelican_micropub.micropub import add_reader, init_micropub_metadata
-
-
 def register():
+    # imported here so that the parsing modules of this package can be used
+    # without Pelican installed
+    from pelican import signals
+    from pelican_micropub.contacts import init_contacts, forget_contacts
+    from pelican_micropub.dateindex import build_post_type_index
+    from pelican_micropub.duplicates import collapse_duplicates
+    from pelican_micropub.gitsource import add_git_articles
+    from pelican_micropub.micropub import init_micropub_metadata
+    from pelican_micropub.prefetch import prefetch_articles, \
+        prefetch_pages, stop_prefetch
+    from pelican_micropub.readers import add_reader
+    from pelican_micropub.replycontext import attach_reply_contexts
+    from pelican_micropub.search import index_articles, index_pages, \
+        write_search_index
+    from pelican_micropub.spill import attach_spilled_content, \
+        collect_spilled_content, prune_spilled_content
+
     signals.readers_init.connect(add_reader)
+    signals.readers_init.connect(init_contacts)
+    signals.article_generator_init.connect(prefetch_articles)
+    signals.page_generator_init.connect(prefetch_pages)
+    signals.content_object_init.connect(attach_spilled_content)
     signals.article_generator_context.connect(init_micropub_metadata)
     signals.page_generator_context.connect(init_micropub_metadata)
     signals.static_generator_context.connect(init_micropub_metadata)
+    signals.article_generator_pretaxonomy.connect(add_git_articles)
+    signals.article_generator_pretaxonomy.connect(collapse_duplicates)
+    signals.article_generator_finalized.connect(attach_reply_contexts)
+    signals.article_generator_finalized.connect(index_articles)
+    signals.article_generator_finalized.connect(build_post_type_index)
+    signals.article_generator_finalized.connect(collect_spilled_content)
+    signals.page_generator_finalized.connect(index_pages)
+    signals.page_generator_finalized.connect(collect_spilled_content)
+    signals.finalized.connect(write_search_index)
+    signals.finalized.connect(prune_spilled_content)
+    signals.finalized.connect(stop_prefetch)
+    signals.finalized.connect(forget_contacts)
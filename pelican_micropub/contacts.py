@@ -0,0 +1,127 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ContactTrie:
+    """h-cards indexed by nickname, case insensitively.
+
+    Looking up a mention walks the trie one character at a time, so it only
+    costs as much as the mention is long, however many contacts there are.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, nickname, card):
+        node = self.root
+        for c in nickname.lower():
+            node = node.setdefault(c, {})
+        node[None] = card
+
+    def get(self, nickname):
+        length, card = self.longest_prefix(nickname)
+        return card if length == len(nickname) else None
+
+    def longest_prefix(self, text):
+        """Return the length of the longest nickname that text starts
+        with, and its h-card.  The nickname has to end on a word boundary,
+        so that "@bob's" finds "bob" but "@bobby" doesn't."""
+        node = self.root
+        found = (0, None)
+        for i, c in enumerate(text.lower()):
+            node = node.get(c)
+            if node is None:
+                break
+            if None in node and (i + 1 == len(text) or
+                                 not _is_word_char(text[i + 1])):
+                found = (i + 1, node[None])
+        return found
+
+
+def _is_word_char(c):
+    return c.isalnum() or c == '_'
+
+
+def _first(props, prop):
+    values = props.get(prop)
+    if not values:
+        return None
+    value = values[0]
+    if isinstance(value, dict):
+        return value.get('value') or value.get('url')
+    return value
+
+
+def simplify_card(item):
+    props = item.get('properties', {})
+    return {
+        'nickname': _first(props, 'nickname'),
+        'name': _first(props, 'name'),
+        'url': _first(props, 'url'),
+        'photo': _first(props, 'photo'),
+    }
+
+
+def build_contacts(items):
+    contacts = ContactTrie()
+    for item in items:
+        if 'h-card' not in item.get('type', []):
+            continue
+        card = simplify_card(item)
+        if not card['url']:
+            continue
+        for nickname in item['properties'].get('nickname', []):
+            if isinstance(nickname, str) and nickname:
+                contacts.add(nickname, card)
+    return contacts
+
+
+def load_contacts(path):
+    """Load a JSON file of h-cards, either as a list or as parsed mf2 with
+    an 'items' key."""
+    with open(path, 'r') as contacts_file:
+        data = json.load(contacts_file)
+    if isinstance(data, dict):
+        data = data.get('items', [])
+    return build_contacts(data)
+
+
+# path -> contacts, or None if they couldn't be loaded, for the current
+# build
+_loaded = {}
+
+
+def get_contacts(settings):
+    path = settings.get('NOTEDOWN_CONTACTS')
+    if not path:
+        return None
+    if path not in _loaded:
+        try:
+            _loaded[path] = load_contacts(path)
+        except (OSError, ValueError) as e:
+            logger.error('Could not load NOTEDOWN_CONTACTS from %s, '
+                         'mentions will not be resolved: %s', path, e)
+            _loaded[path] = None
+    return _loaded[path]
+
+
+def init_contacts(readers):
+    # load the contacts before any note is read, so that a broken contacts
+    # file is reported up front, and only once
+    get_contacts(readers.settings)
+
+
+def forget_contacts(pelican):
+    # so that the next build, e.g. with --autoreload, sees any change
+    _loaded.clear()
+
+
+def resolve_mentions(mentions, contacts):
+    cards = []
+    for mention in mentions:
+        length, card = contacts.longest_prefix(mention)
+        if card is not None and card not in cards:
+            cards.append(card)
+    return cards
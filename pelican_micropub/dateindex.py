@@ -0,0 +1,54 @@
+class PostTypeIndex:
+    """Published articles by post type, sorted newest first, and bucketed
+    by month, for templates that list e.g. the latest notes or likes.
+
+    In a template::
+
+        {% for note in micropub_posts.latest('note', 20) %}
+        {% for year, month in micropub_posts.months('like') %}
+        {% for like in micropub_posts.month('like', 2019, 8) %}
+    """
+
+    def __init__(self, articles=()):
+        self.by_type = {}
+        self.by_month = {}
+
+        for article in articles:
+            post_type = getattr(article, 'post_type', None)
+            if post_type is None or getattr(article, 'date', None) is None:
+                continue
+            self.by_type.setdefault(post_type, []).append(article)
+
+        # sorting each post type once, and then slicing it into months,
+        # is what keeps this cheap whatever order the articles come in
+        for post_type, articles in self.by_type.items():
+            articles.sort(key=lambda a: a.date.timestamp(), reverse=True)
+            months = self.by_month[post_type] = {}
+            for article in articles:
+                key = (article.date.year, article.date.month)
+                months.setdefault(key, []).append(article)
+
+    def post_types(self):
+        return sorted(self.by_type)
+
+    def latest(self, post_type, count=None):
+        articles = self.by_type.get(post_type)
+        if articles is None:
+            return []
+        return articles[:count]
+
+    def months(self, post_type):
+        return sorted(self.by_month.get(post_type, {}), reverse=True)
+
+    def month(self, post_type, year, month):
+        articles = self.by_month.get(post_type, {}).get((year, month))
+        if articles is None:
+            return []
+        return articles[:]
+
+    def __getitem__(self, post_type):
+        return self.latest(post_type)
+
+
+def build_post_type_index(generator):
+    generator.context['micropub_posts'] = PostTypeIndex(generator.articles)
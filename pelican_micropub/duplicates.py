@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The properties that make two entries the same post.  Anything else, like
+# 'published' or 'mp-slug', tends to differ between retries of one post
+fingerprinted_properties = ['name', 'content', 'in-reply-to', 'like-of',
+                            'repost-of', 'bookmark-of', 'photo']
+
+
+def normalize_value(value):
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    if isinstance(value, dict):
+        return {k: normalize_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize_value(v) for v in value]
+    return value
+
+
+def fingerprint(post):
+    props = post.get('properties', {})
+    normalized = {}
+    for prop in fingerprinted_properties:
+        if props.get(prop):
+            normalized[prop] = normalize_value(props[prop])
+    if not normalized:
+        return None
+
+    data = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def find_duplicates(articles, window=600):
+    """Pair each duplicate with its original.
+
+    Copies sharing a fingerprint are only duplicates when they were
+    published within window seconds of the original: saying "good morning"
+    twice on different days is fine.  The original is the earliest of the
+    copies, ties being broken by source path, so the same copy survives
+    from one build to the next whatever order the files were read in.
+    """
+    copies = {}
+    for article in articles:
+        key = getattr(article, 'fingerprint', None)
+        if key is not None:
+            copies.setdefault(key, []).append(article)
+
+    duplicates = []
+    for group in copies.values():
+        original = None
+        for article in sorted(group, key=_rank):
+            if original is not None and \
+                    (article.date - original.date).total_seconds() <= window:
+                duplicates.append((article, original))
+            else:
+                original = article
+
+    # in the order the articles came in
+    order = {id(article): i for i, article in enumerate(articles)}
+    duplicates.sort(key=lambda pair: order[id(pair[0])])
+    return duplicates
+
+
+def collapse_duplicates(generator):
+    policy = generator.settings.get('MICROPUB_DUPLICATES')
+    if not policy:
+        return
+
+    duplicates = find_duplicates(
+        generator.articles,
+        generator.settings.get('MICROPUB_DUPLICATES_WINDOW', 600))
+    for duplicate, original in duplicates:
+        logger.warning('%s is a duplicate of %s', duplicate.source_path,
+                       original.source_path)
+        duplicate.duplicate_of = original
+
+    if policy == 'report' or not duplicates:
+        return
+
+    demoted = {id(duplicate) for duplicate, _ in duplicates}
+    generator.articles = [a for a in generator.articles
+                          if id(a) not in demoted]
+
+    if policy == 'drop':
+        # nothing is written for the copies, and links to them lead to
+        # the original instead
+        generated = generator.context.get('generated_content', {})
+        for duplicate, original in duplicates:
+            path = duplicate.get_relative_source_path()
+            if generated.get(path) is duplicate:
+                generated[path] = original
+        return
+
+    status = 'hidden' if policy == 'hidden' else 'draft'
+    target = generator.drafts
+    if status == 'hidden' and hasattr(generator, 'hidden_articles'):
+        target = generator.hidden_articles
+    for duplicate, _ in duplicates:
+        duplicate.status = status
+        target.append(duplicate)
+
+
+def _rank(article):
+    return (article.date, article.source_path or '')
@@ -0,0 +1,68 @@
+import os
+
+from pelican_micropub.prefetch import discard_prefetched
+from pelican_micropub.spill import spilling
+
+
+class SharedEntry:
+    """The part of a parsed entry that doesn't depend on any settings, and
+    can therefore be shared by every site built from the same content."""
+
+    def __init__(self, post_type, text, extracted, post=None, entry=None,
+                 metadata=None):
+        self.post_type = post_type
+        self.text = text
+        self.extracted = extracted
+        # micropub entries
+        self.post = post
+        self.entry = entry
+        # notedown entries
+        self.metadata = metadata
+
+
+class EntryStore:
+    """Loaded entries by real path, for the whole process.
+
+    An entry is loaded again only when its file, or one of the files it
+    depends on, changes on disk.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, filename, load, *dependencies):
+        key = os.path.realpath(filename)
+        signature = tuple(file_signature(path)
+                          for path in (filename,) + dependencies)
+        cached = self.entries.get(key)
+        if cached and cached[0] == signature:
+            discard_prefetched(filename)
+            return cached[1]
+
+        value = load(filename)
+        self.entries[key] = (signature, value)
+        return value
+
+    def clear(self):
+        self.entries = {}
+
+
+def file_signature(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+shared_entries = EntryStore()
+
+
+def get_shared_entry(filename, load, settings, *dependencies):
+    """Load an entry through shared_entries, if MICROPUB_SHARE_ENTRIES is
+    set.  The store keeps every entry for the life of the process, which is
+    only worth it when the same process builds more than one site, and
+    not at all when bodies are spilled to disk."""
+    if not settings.get('MICROPUB_SHARE_ENTRIES') or spilling(settings):
+        return load(filename)
+    return shared_entries.get(filename, load, *dependencies)
@@ -0,0 +1,205 @@
+"""Read entries straight out of a git repository, such as the one
+micropub-git-server commits to, without needing a checkout.
+
+The tree is listed once with ``git ls-tree`` and the blobs are read through
+a single ``git cat-file --batch`` process.  With ``MICROPUB_SHARE_ENTRIES``
+set, the settings independent part of each parsed entry is cached by blob
+id, so entries that didn't change since the last time the repository was
+read are neither read nor parsed again; they are only rendered for the
+settings at hand.
+"""
+import json
+import logging
+import os
+import subprocess
+
+from pelican_micropub.micropub import share_micropub, share_notedown, \
+    render_micropub, render_notedown, adjust_metadata
+from pelican_micropub.oplog import ops_extension, apply_operations
+from pelican_micropub.spill import spilling
+from pelican_micropub.stream import Entry
+
+logger = logging.getLogger(__name__)
+
+
+def decode_micropub(data, ops_data):
+    post = json.loads(data.decode('utf-8'))
+    if ops_data:
+        operations = [json.loads(line) for line in
+                      ops_data.decode('utf-8').splitlines() if line.strip()]
+        post = apply_operations(post, operations)
+    return share_micropub(post)
+
+
+def decode_notedown(data, ops_data):
+    return share_notedown(data.decode('utf-8'))
+
+
+entry_decoders = {
+    '.mp': (decode_micropub, render_micropub),
+    '.nd': (decode_notedown, render_notedown),
+}
+
+# (blob id, operation log blob id) -> settings independent part of an entry,
+# for the entries of the tree read last
+_shared = {}
+
+
+def git(repo, *args, **kwargs):
+    return subprocess.run(['git', '-C', repo] + list(args),
+                          stdout=subprocess.PIPE, check=True,
+                          **kwargs).stdout
+
+
+def list_tree(repo, ref='HEAD', path=''):
+    """Map the path of every blob under path, at ref, to its blob id."""
+    args = ['ls-tree', '-r', '-z', '--full-tree', ref]
+    if path:
+        args += ['--', path]
+
+    blobs = {}
+    for line in git(repo, *args).split(b'\0'):
+        if not line:
+            continue
+        info, name = line.split(b'\t', 1)
+        _, kind, oid = info.split()
+        if kind == b'blob':
+            blobs[name.decode('utf-8')] = oid.decode('ascii')
+    return blobs
+
+
+def read_blobs(repo, oids):
+    """Read the contents of many blobs through one git process."""
+    contents = {}
+    if not oids:
+        return contents
+
+    process = subprocess.Popen(['git', '-C', repo, 'cat-file', '--batch'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        for oid in oids:
+            process.stdin.write(oid.encode('ascii') + b'\n')
+            process.stdin.flush()
+            header = process.stdout.readline().split()
+            if len(header) < 3 or header[1] == b'missing':
+                raise Exception(f'Could not read blob {oid}')
+            size = int(header[2])
+            contents[oid] = process.stdout.read(size)
+            process.stdout.read(1)
+    finally:
+        process.stdin.close()
+        process.stdout.close()
+        process.wait()
+    return contents
+
+
+def iter_git_entries(repo, ref='HEAD', path='', settings=None):
+    """Yield an Entry for every micropub and notedown file under path in
+    the repository at ref, in path order."""
+    settings = settings or {}
+    blobs = list_tree(repo, ref, path)
+    # spilling bodies is pointless if the posts are kept around anyway
+    keep = settings.get('MICROPUB_SHARE_ENTRIES') and not spilling(settings)
+
+    entries = []
+    for name in sorted(blobs):
+        extension = os.path.splitext(name)[1]
+        if extension in entry_decoders:
+            ops_oid = blobs.get(name + ops_extension)
+            entries.append((name, extension, (blobs[name], ops_oid)))
+
+    # forget the entries that were edited or removed since
+    current = {key for _, _, key in entries}
+    for key in [key for key in _shared if key not in current]:
+        del _shared[key]
+
+    wanted = set()
+    for name, extension, key in entries:
+        if not keep or key not in _shared:
+            wanted.update(oid for oid in key if oid)
+    contents = read_blobs(repo, sorted(wanted))
+
+    for name, extension, key in entries:
+        decode, render = entry_decoders[extension]
+        try:
+            shared = _shared.get(key) if keep else None
+            if shared is None:
+                oid, ops_oid = key
+                shared = decode(contents[oid], contents.get(ops_oid))
+                if keep:
+                    _shared[key] = shared
+            html, metadata, shared = render(shared, settings)
+        except Exception:
+            logger.exception('Could not process %s', name)
+            continue
+        yield Entry(name, html, adjust_metadata(metadata, shared.text,
+                                                settings, shared.extracted))
+
+
+def add_git_articles(generator):
+    """Add the entries of MICROPUB_GIT_REPO to the articles of a build.
+
+    They go through the same validation, translation and ordering as the
+    articles Pelican read itself.
+    """
+    settings = generator.settings
+    repo = settings.get('MICROPUB_GIT_REPO')
+    if not repo:
+        return
+
+    from pelican import signals
+    from pelican.contents import Article
+    from pelican.readers import default_metadata
+    from pelican.utils import order_content, process_translations
+    from pelican_micropub.readers import MicropubReader
+    from pelican_micropub.spill import spill
+
+    reader = MicropubReader(settings)
+    added = {'published': [], 'draft': [], 'hidden': []}
+    for name, html, raw in iter_git_entries(
+            repo, settings.get('MICROPUB_GIT_REF', 'HEAD'),
+            settings.get('MICROPUB_GIT_PATH', ''), settings):
+        metadata = _discard(default_metadata(
+            settings=settings, process=reader.process_metadata))
+        processed = {}
+        for key, value in raw.items():
+            processed[key] = reader.process_metadata(key, value)
+        metadata.update(_discard(processed))
+        html, metadata = spill(html, metadata, settings)
+        signals.article_generator_context.send(generator, metadata=metadata)
+        if metadata.get('status') == 'skip':
+            continue
+
+        article = Article(content=html, metadata=metadata, settings=settings,
+                          source_path=os.path.join(repo, name),
+                          context=generator.context)
+        if not article.is_valid() or article.status not in added:
+            continue
+        added[article.status].append(article)
+        generator.add_source_path(article)
+        generator.add_static_links(article)
+
+    def merge(originals, translations, articles):
+        originals, translations = process_translations(
+            originals + translations + articles,
+            translation_id=settings['ARTICLE_TRANSLATION_ID'])
+        return order_content(originals, settings['ARTICLE_ORDER_BY']), \
+            translations
+
+    if added['published']:
+        generator.articles, generator.translations = merge(
+            generator.articles, generator.translations, added['published'])
+    if added['hidden']:
+        generator.hidden_articles, generator.hidden_translations = merge(
+            generator.hidden_articles, generator.hidden_translations,
+            added['hidden'])
+    if added['draft']:
+        generator.drafts, generator.drafts_translations = merge(
+            generator.drafts, generator.drafts_translations, added['draft'])
+
+
+def _discard(metadata):
+    # Pelican's metadata processors turn empty tags, authors, slugs and
+    # statuses into a bare object(), for the reader to leave out
+    return {key: value for key, value in metadata.items()
+            if type(value) is not object}
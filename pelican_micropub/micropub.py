@@ -1,9 +1,14 @@
-import json
+import copy
 import mf2util
 import markdown
 import datetime
 
-from pelican.readers import BaseReader
+from pelican_micropub.contacts import get_contacts, resolve_mentions
+from pelican_micropub.duplicates import fingerprint
+from pelican_micropub.entrystore import SharedEntry, get_shared_entry
+from pelican_micropub.oplog import read_entry, ops_path
+from pelican_micropub.prefetch import take_prefetched
+from pelican_micropub.sanitize import sanitize_html
 from pelican_micropub.notedown import convert2html, extract_hashtags, \
     extract_mentions, extract_links
 
@@ -20,62 +25,110 @@ supported_post_types = ['reply', 'repost', 'like', 'photo', 'article', 'note']
 # The default default category
 default_category = 'miscellanea'
 
+# The readers used to live here, and need Pelican, which this module
+# doesn't; they are still importable from here, but only on demand (which
+# takes a module __getattr__, hence Python 3.7)
+moved_to_readers = ['MicropubReader', 'NotedownReader', 'add_reader']
 
-class MicropubReader(BaseReader):
-    enabled = True
-    file_extensions = ['mp']
 
-    def read(self, filename):
-        post = json.loads(read_whole_file(filename))
-        html, metadata = micropub2pelican(post, self.settings)
-        parsed = {}
-        for key, value in metadata.items():
-            parsed[key] = self.process_metadata(key, value)
-        return html, adjust_metadata(parsed, text_content(post))
+def __getattr__(name):
+    if name in moved_to_readers:
+        from pelican_micropub import readers
+        return getattr(readers, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
-class NotedownReader(BaseReader):
-    enabled = True
-    file_extensions = ['nd']
+def read_micropub(filename, settings={}):
+    shared = get_shared_entry(filename, load_micropub, settings,
+                              ops_path(filename))
+    return render_micropub(shared, settings)
 
-    def read(self, filename):
-        contents = read_whole_file(filename)
 
-        meta_text = contents.split("\n\n", 2)
-        metadata = extract_markdown_metadata(meta_text[0] + "\n\n")
+def read_notedown(filename, settings={}):
+    shared = get_shared_entry(filename, load_notedown, settings)
+    return render_notedown(shared, settings)
 
-        post_type = infer_post_type(metadata, meta_text[1])
-        metadata['post_type'] = post_type
-        category = get_category(self.settings, post_type)
-        if category:
-            metadata['category'] = category
 
-        parsed = {}
-        for key, value in metadata.items():
-            parsed[key] = self.process_metadata(key, value)
+def load_micropub(filename):
+    return share_micropub(read_entry(filename))
 
-        return notedown(meta_text[1], self.settings),\
-            adjust_metadata(parsed, meta_text[1])
 
+def load_notedown(filename):
+    return share_notedown(read_whole_file(filename))
 
-def adjust_metadata(parsed, text):
+
+def share_micropub(post):
+    post_type, entry = interpret_post(post)
+    text = text_content(post)
+    return SharedEntry(post_type, text, extract_text_metadata(text),
+                       post=post, entry=entry)
+
+
+def share_notedown(contents):
+    meta_text = contents.split("\n\n", 2)
+    metadata = extract_markdown_metadata(meta_text[0] + "\n\n")
+    post_type = infer_post_type(metadata, meta_text[1])
+    return SharedEntry(post_type, meta_text[1],
+                       extract_text_metadata(meta_text[1]),
+                       metadata=metadata)
+
+
+def render_micropub(shared, settings={}):
+    post = shared.post
+    html = get_html(settings, post, shared.post_type)
+    metadata = get_metadata(settings, shared.entry, post, shared.post_type)
+    if post.get('deleted'):
+        metadata['status'] = settings.get('MICROPUB_DELETED_STATUS', 'draft')
+    return html, metadata, shared
+
+
+def render_notedown(shared, settings={}):
+    metadata = dict(shared.metadata)
+    metadata['post_type'] = shared.post_type
+    category = get_category(settings, shared.post_type)
+    if category:
+        metadata['category'] = category
+
+    return notedown(shared.text, settings), metadata, shared
+
+
+def extract_text_metadata(text):
+    if text is None:
+        return {}
+    return {
+        'hashtags': extract_hashtags(text),
+        'mentions': extract_mentions(text),
+        'links': extract_links(text),
+    }
+
+
+def adjust_metadata(parsed, text, settings={}, extracted=None):
     if text is None:
         return parsed
 
     if parsed.get('title') is None:
         parsed['title'] = text
 
-    hashtags = extract_hashtags(text)
+    if extracted is None:
+        extracted = extract_text_metadata(text)
+
+    # extracted may be shared with other sites, so hand out copies
+    hashtags = extracted['hashtags']
     if hashtags:
-        parsed['hashtags'] = hashtags
+        parsed['hashtags'] = list(hashtags)
 
-    mentions = extract_mentions(text)
+    mentions = extracted['mentions']
     if mentions:
-        parsed['mentions'] = mentions
-
-    links = extract_links(text)
+        parsed['mentions'] = list(mentions)
+        contacts = get_contacts(settings)
+        if contacts:
+            cards = resolve_mentions(mentions, contacts)
+            if cards:
+                parsed['mention_cards'] = cards
+
+    links = extracted['links']
     if links:
-        parsed['links'] = links
+        parsed['links'] = list(links)
 
     return parsed
 
@@ -142,6 +195,12 @@ def get_content_headers(settings):
 
 
 def micropub2pelican(post, settings={}):
+    post_type, entry = interpret_post(post)
+    return get_html(settings, post, post_type), \
+        get_metadata(settings, entry, post, post_type)
+
+
+def interpret_post(post):
     post_type = mf2util.post_type_discovery(post)
     if post_type not in supported_post_types:
         raise Exception(f'{post_type} not among supported post types')
@@ -150,17 +209,18 @@ def micropub2pelican(post, settings={}):
     if not entry:
         raise Exception('Could not interpret parsed entry')
 
-    return get_html(settings, post, post_type), \
-        get_metadata(settings, entry, post, post_type)
+    return post_type, entry
 
 
 def get_metadata(settings, entry, post, post_type):
     slug = get_slug(post)
     published = get_single_prop(post, 'published')
     updated = get_single_prop(post, 'updated') or published
+    # the post may be shared with other sites, so the metadata mustn't share
+    # anything mutable with it
     metadata = {
         'slug': slug,
-        'tags': post['properties'].get('category', []),
+        'tags': list(post['properties'].get('category', [])),
         'date': published,
         'modified': updated,
         'title': entry.get('name') or entry.get('content-plain'),
@@ -169,7 +229,8 @@ def get_metadata(settings, entry, post, post_type):
         'like_of': get_url_prop(entry, 'like-of'),
         'repost_of': get_url_prop(entry, 'repost-of'),
         'bookmark_of': get_url_prop(entry, 'bookmark-of'),
-        'mp_syndicate_to': post['properties'].get('mp-syndicate-to', []),
+        'mp_syndicate_to': list(post['properties'].get('mp-syndicate-to',
+                                                       [])),
         'post_type': post_type
     }
 
@@ -177,15 +238,19 @@ def get_metadata(settings, entry, post, post_type):
     if category:
         metadata['category'] = category
 
+    post_fingerprint = fingerprint(post)
+    if post_fingerprint:
+        metadata['fingerprint'] = post_fingerprint
+
     if 'author' in entry:
         metadata['author'] = entry['author']['name']
-        metadata['author-full'] = entry['author']
+        metadata['author-full'] = copy.deepcopy(entry['author'])
 
     if 'photo' in post['properties']:
         metadata['photo'] = []
         for photo in post['properties']['photo']:
             if isinstance(photo, dict):
-                metadata['photo'].append(photo)
+                metadata['photo'].append(copy.deepcopy(photo))
             elif isinstance(photo, str):
                 metadata['photo'].append({'value': photo})
 
@@ -226,6 +291,10 @@ def get_category(settings, post_type):
 
 
 def get_html(settings, post, post_type):
+    return sanitize_html(render_html(settings, post, post_type), settings)
+
+
+def render_html(settings, post, post_type):
     html = html_content(post)
     if html:
         return html
@@ -266,18 +335,13 @@ def notedown(text, settings):
     hashtag_template = settings.get('NOTEDOWN_HASHTAG_TEMPLATE')
     mention_template = settings.get('NOTEDOWN_MENTION_TEMPLATE')
     return convert2html(text, not url_linking_disabled, hashtag_template,
-                        mention_template)
+                        mention_template, get_contacts(settings))
 
 
 def read_whole_file(filename):
+    content = take_prefetched(filename)
+    if content is not None:
+        return content
     with open(filename, 'r') as content_file:
         content = content_file.read()
     return content
-
-
-def add_reader(readers):
-    for ext in MicropubReader.file_extensions:
-        readers.reader_classes[ext] = MicropubReader
-
-    for ext in NotedownReader.file_extensions:
-        readers.reader_classes[ext] = NotedownReader
@@ -28,9 +28,25 @@ def extract_links(text):
     return link_re.findall(text)
 
 
+def link_mention(m, contacts, mention_template=None):
+    """Link a mention to the matching contact's site, falling back on the
+    mention template for people we don't know."""
+    length, card = contacts.longest_prefix(m.group(3))
+    if card is not None:
+        at, mention = m.group(2)[0], m.group(3)
+        return m.group(1) + '<a href="' + card['url'] + '">' + at + \
+            mention[:length] + '</a>' + mention[length:]
+    if mention_template:
+        return m.group(1) + '<a href="' + \
+            mention_template.format(mention=m.group(3)) + '">' + \
+            m.group(2) + '</a>'
+    return m.group(0)
+
+
 def convert2html(text, url_linking=False,
                  hashtag_template=None,
-                 mention_template=None):
+                 mention_template=None,
+                 contacts=None):
     if url_linking:
         text = link_re.sub(r'<a href="\1">\1</a>', text)
 
@@ -39,7 +55,10 @@ def convert2html(text, url_linking=False,
                               hashtag_template.format(hashtag=r'\3') +
                               r'">\2</a>', text)
 
-    if mention_template:
+    if contacts:
+        text = mention_re.sub(
+            lambda m: link_mention(m, contacts, mention_template), text)
+    elif mention_template:
         text = mention_re.sub(r'\1<a href="' +
                               mention_template.format(mention=r'\3') +
                               r'">\2</a>', text)
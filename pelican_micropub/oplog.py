@@ -0,0 +1,164 @@
+"""Append-only Micropub operation logs.
+
+Updates and deletes of a micropub entry are appended, one JSON action per
+line, to a log sitting next to the entry (``<entry>.mp.ops``), instead of
+rewriting the entry itself.  The log is applied to the entry's properties
+when it is read, and can later be folded back into the entry with
+``compact``, or from the command line::
+
+    python -m pelican_micropub.oplog content/
+"""
+import argparse
+import copy
+import json
+import os
+
+from pelican_micropub.prefetch import take_prefetched
+
+ops_extension = '.ops'
+
+compacting_extension = '.compacting'
+
+supported_actions = ['update', 'delete', 'undelete']
+
+
+def ops_path(filename):
+    return filename + ops_extension
+
+
+def append_operation(filename, operation):
+    action = operation.get('action')
+    if action not in supported_actions:
+        raise Exception(f'{action} not among supported actions')
+
+    with open(ops_path(filename), 'a') as ops_file:
+        ops_file.write(json.dumps(operation) + '\n')
+
+    # Pelican only looks at the entry itself when deciding if its cached
+    # content is still valid, so make sure it notices the new operation
+    os.utime(filename)
+
+
+def read_operations(filename):
+    return read_log(ops_path(filename))
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return []
+
+    operations = []
+    with open(path, 'r') as ops_file:
+        for line in ops_file:
+            line = line.strip()
+            if line:
+                operations.append(json.loads(line))
+    return operations
+
+
+def apply_operation(post, operation):
+    action = operation.get('action')
+    if action == 'delete':
+        post['deleted'] = True
+    elif action == 'undelete':
+        post.pop('deleted', None)
+    elif action == 'update':
+        props = post.setdefault('properties', {})
+        for prop, values in operation.get('replace', {}).items():
+            props[prop] = list(values)
+        for prop, values in operation.get('add', {}).items():
+            props.setdefault(prop, []).extend(values)
+        delete = operation.get('delete', [])
+        if isinstance(delete, dict):
+            for prop, values in delete.items():
+                if prop in props:
+                    props[prop] = [v for v in props[prop] if v not in values]
+                    if not props[prop]:
+                        del props[prop]
+        else:
+            for prop in delete:
+                props.pop(prop, None)
+    else:
+        raise Exception(f'{action} not among supported actions')
+    return post
+
+
+def apply_operations(post, operations):
+    if not operations:
+        return post
+
+    post = copy.deepcopy(post)
+    for operation in operations:
+        apply_operation(post, operation)
+    return post
+
+
+def read_entry(filename):
+    """Read an entry with its pending operations applied."""
+    contents = take_prefetched(filename)
+    if contents is None:
+        with open(filename, 'r') as content_file:
+            contents = content_file.read()
+    return apply_operations(json.loads(contents), read_operations(filename))
+
+
+def compact(filename):
+    """Fold an entry's log back into the entry and remove the log.
+
+    The log is first renamed aside, so that operations appended while we
+    are at it go to a fresh log, to be applied on top of the compacted
+    entry, instead of being lost.
+    """
+    path = ops_path(filename)
+    snapshot = path + compacting_extension
+    if os.path.exists(snapshot):
+        raise Exception(f'{snapshot} is left over from an interrupted '
+                        f'compaction, check whether {filename} already '
+                        f'includes it before removing it')
+    try:
+        os.rename(path, snapshot)
+    except FileNotFoundError:
+        return False
+
+    with open(filename, 'r') as content_file:
+        post = json.loads(content_file.read())
+    post = apply_operations(post, read_log(snapshot))
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as content_file:
+        json.dump(post, content_file, indent=2)
+    os.replace(tmp, filename)
+    os.remove(snapshot)
+    return True
+
+
+def compact_tree(path):
+    compacted = []
+    for dirpath, _, filenames in os.walk(path):
+        for name in sorted(filenames):
+            if not name.endswith(ops_extension):
+                continue
+            filename = os.path.join(dirpath, name[:-len(ops_extension)])
+            if os.path.exists(filename) and compact(filename):
+                compacted.append(filename)
+    return compacted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Fold micropub operation logs back into their entries')
+    parser.add_argument('paths', nargs='+',
+                        help='content directories or entry files')
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        if os.path.isdir(path):
+            compacted = compact_tree(path)
+        else:
+            compacted = [path] if compact(path) else []
+        for filename in compacted:
+            print(f'compacted {filename}')
+
+
+if __name__ == '__main__':
+    main()
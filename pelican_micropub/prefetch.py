@@ -0,0 +1,190 @@
+"""Read entry files ahead of the readers, on a pool of threads.
+
+On a network filesystem every open and read costs a round trip, and
+Pelican reads one file at a time.  With ``MICROPUB_PREFETCH`` set, the
+micropub and notedown files the article and page generators are about to
+read are read concurrently, in the order the generators will ask for them,
+into a buffer capped by ``MICROPUB_PREFETCH_MAX_BYTES`` and
+``MICROPUB_PREFETCH_MAX_FILES``, and the readers take their contents from
+there.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+prefetched_extensions = ('.mp', '.nd')
+
+
+def read_file(path):
+    with open(path, 'r') as content_file:
+        return content_file.read()
+
+
+def files_to_read(generator, paths, exclude):
+    """The entry files generator will read, in the order it will read them.
+
+    Pelican iterates over what get_files returns, which may be a set, so
+    its order is only reproduced by asking get_files for exactly the same
+    files, and filtering afterwards.
+    """
+    return [os.path.abspath(os.path.join(generator.path, f))
+            for f in generator.get_files(paths, exclude=exclude)
+            if f.endswith(prefetched_extensions)]
+
+
+class Prefetcher:
+    """Read paths, in order, ahead of whoever takes them.
+
+    Paths are expected to be taken in the same order.  Taking one means the
+    ones before it won't be taken any more (they were found in a cache, say)
+    so they are dropped from the buffer, or not read at all.
+    """
+
+    def __init__(self, paths, workers=8, max_bytes=64 * 1024 * 1024,
+                 max_files=256, read=read_file):
+        self.paths = list(paths)
+        self.positions = {path: i for i, path in enumerate(self.paths)}
+        self.read = read
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.claimed = -1
+        self.buffered_bytes = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def take(self, path):
+        """Return the contents of path, waiting for them if they are being
+        read, or None if path wasn't (and now won't be) prefetched."""
+        with self.condition:
+            self._claim(path)
+            future = self.pending.pop(path, None)
+            if future is None:
+                return None
+        try:
+            contents = future.result()
+        except Exception:
+            contents = None
+        with self.condition:
+            if contents is not None:
+                self.buffered_bytes -= len(contents)
+            self.condition.notify_all()
+        return contents
+
+    def discard(self, path):
+        """Drop path from the buffer, for when its contents turn out not to
+        be needed after all."""
+        with self.condition:
+            self._claim(path)
+            future = self.pending.pop(path, None)
+            if future is not None:
+                self._drop(future)
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.pending = {}
+            self.condition.notify_all()
+        self.thread.join()
+        self.executor.shutdown(wait=False)
+
+    def _claim(self, path):
+        position = self.positions.get(path)
+        if position is None or position <= self.claimed:
+            return
+        self.claimed = position
+        # pending is in path order, so the files passed over come first
+        while self.pending:
+            first = next(iter(self.pending))
+            if self.positions[first] >= position:
+                break
+            self._drop(self.pending.pop(first))
+        self.condition.notify_all()
+
+    def _drop(self, future):
+        future.cancel()
+        future.add_done_callback(self._release)
+
+    def _run(self):
+        for position, path in enumerate(self.paths):
+            with self.condition:
+                while not self.closed and self._full() and \
+                        position > self.claimed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                if position <= self.claimed:
+                    continue
+                self.pending[path] = self.executor.submit(self._read, path)
+
+    def _read(self, path):
+        contents = self.read(path)
+        with self.condition:
+            self.buffered_bytes += len(contents)
+        return contents
+
+    def _release(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self.condition:
+            self.buffered_bytes -= len(future.result())
+            self.condition.notify_all()
+
+    def _full(self):
+        return len(self.pending) >= self.max_files or \
+            self.buffered_bytes >= self.max_bytes
+
+
+# (content path, generator) -> prefetcher
+_active = {}
+
+
+def take_prefetched(path):
+    for prefetcher in list(_active.values()):
+        contents = prefetcher.take(path)
+        if contents is not None:
+            return contents
+    return None
+
+
+def discard_prefetched(path):
+    for prefetcher in list(_active.values()):
+        prefetcher.discard(path)
+
+
+def start_prefetch(generator, paths, exclude):
+    settings = generator.settings
+    if not settings.get('MICROPUB_PREFETCH'):
+        return
+
+    key = (os.path.abspath(settings['PATH']), type(generator).__name__)
+    old = _active.pop(key, None)
+    if old:
+        old.close()
+
+    _active[key] = Prefetcher(
+        files_to_read(generator, paths, exclude),
+        workers=settings.get('MICROPUB_PREFETCH_WORKERS', 8),
+        max_bytes=settings.get('MICROPUB_PREFETCH_MAX_BYTES',
+                               64 * 1024 * 1024),
+        max_files=settings.get('MICROPUB_PREFETCH_MAX_FILES', 256))
+
+
+def prefetch_articles(generator):
+    start_prefetch(generator, generator.settings['ARTICLE_PATHS'],
+                   generator.settings['ARTICLE_EXCLUDES'])
+
+
+def prefetch_pages(generator):
+    start_prefetch(generator, generator.settings['PAGE_PATHS'],
+                   generator.settings['PAGE_EXCLUDES'])
+
+
+def stop_prefetch(pelican):
+    path = os.path.abspath(pelican.settings['PATH'])
+    for key in [key for key in _active if key[0] == path]:
+        _active.pop(key).close()
@@ -0,0 +1,40 @@
+from pelican.readers import BaseReader
+from pelican_micropub.micropub import read_micropub, read_notedown, \
+    adjust_metadata
+from pelican_micropub.spill import spill
+
+
+class MicropubReader(BaseReader):
+    enabled = True
+    file_extensions = ['mp']
+
+    def read(self, filename):
+        html, metadata, shared = read_micropub(filename, self.settings)
+        parsed = {}
+        for key, value in metadata.items():
+            parsed[key] = self.process_metadata(key, value)
+        return spill(html, adjust_metadata(parsed, shared.text, self.settings,
+                                           shared.extracted),
+                     self.settings)
+
+
+class NotedownReader(BaseReader):
+    enabled = True
+    file_extensions = ['nd']
+
+    def read(self, filename):
+        html, metadata, shared = read_notedown(filename, self.settings)
+        parsed = {}
+        for key, value in metadata.items():
+            parsed[key] = self.process_metadata(key, value)
+        return spill(html, adjust_metadata(parsed, shared.text, self.settings,
+                                           shared.extracted),
+                     self.settings)
+
+
+def add_reader(readers):
+    for ext in MicropubReader.file_extensions:
+        readers.reader_classes[ext] = MicropubReader
+
+    for ext in NotedownReader.file_extensions:
+        readers.reader_classes[ext] = NotedownReader
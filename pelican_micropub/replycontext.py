@@ -0,0 +1,415 @@
+import asyncio
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from pelican_micropub.micropub import get_content_headers
+
+logger = logging.getLogger(__name__)
+
+# Properties whose first occurrence we capture from the target page.  The
+# microformats classes win over the plain HTML fallbacks (<title>, <meta>)
+captured_classes = {
+    'p-name': 'name',
+    'p-summary': 'summary',
+    'e-content': 'content',
+    'p-content': 'content',
+    'p-author': 'author',
+}
+
+meta_fallbacks = {
+    'og:title': 'name',
+    'twitter:title': 'name',
+    'author': 'author',
+    'article:author': 'author',
+    'og:description': 'summary',
+    'description': 'summary',
+}
+
+void_elements = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+max_redirects = 5
+
+
+class ContextParser(HTMLParser):
+    """Pull a name, author and excerpt out of a target page.
+
+    This is a deliberately small subset of microformats parsing: the first
+    h-entry on the page is examined for p-name, p-author, p-summary and
+    e-content, and <title> and <meta> tags are used when those are missing.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = {}
+        self.fallbacks = {}
+        self.in_entry = False
+        self.entry_done = False
+        self.depth = 0
+        self.entry_depth = None
+        self.capturing = []
+        self.in_title = False
+        self.title = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'meta':
+            key = attrs.get('property') or attrs.get('name')
+            prop = meta_fallbacks.get((key or '').lower())
+            if prop and attrs.get('content'):
+                self.fallbacks.setdefault(prop, attrs['content'])
+            return
+        if tag == 'title':
+            self.in_title = True
+        if tag in void_elements:
+            return
+
+        self.depth += 1
+        classes = (attrs.get('class') or '').split()
+        if not self.in_entry and not self.entry_done and 'h-entry' in classes:
+            self.in_entry = True
+            self.entry_depth = self.depth
+
+        if self.in_entry:
+            for cls in classes:
+                prop = captured_classes.get(cls)
+                if prop and prop not in self.found:
+                    self.found[prop] = []
+                    self.capturing.append((prop, self.depth))
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        if tag in void_elements:
+            return
+
+        self.capturing = [(prop, depth) for prop, depth in self.capturing
+                          if depth < self.depth]
+        if self.in_entry and self.depth == self.entry_depth:
+            self.in_entry = False
+            self.entry_done = True
+        self.depth = max(self.depth - 1, 0)
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        for prop, _ in self.capturing:
+            self.found[prop].append(data)
+
+    def result(self):
+        props = {}
+        for prop, chunks in self.found.items():
+            text = ' '.join(''.join(chunks).split())
+            if text:
+                props[prop] = text
+        for prop, value in self.fallbacks.items():
+            props.setdefault(prop, ' '.join(value.split()))
+        title = ' '.join(''.join(self.title).split())
+        if title:
+            props.setdefault('name', title)
+        return props
+
+
+def parse_context(url, html, excerpt_length=280):
+    parser = ContextParser()
+    parser.feed(html)
+    parser.close()
+    props = parser.result()
+
+    excerpt = props.get('summary') or props.get('content') or ''
+    if excerpt_length and len(excerpt) > excerpt_length:
+        excerpt = excerpt[:excerpt_length].rsplit(' ', 1)[0] + '…'
+
+    # a note's name is just its content, which makes a poor title
+    name = props.get('name')
+    if name and name == props.get('content'):
+        name = None
+
+    return {
+        'url': url,
+        'name': name,
+        'author': props.get('author'),
+        'excerpt': excerpt,
+    }
+
+
+def decode(body, charset):
+    try:
+        return body.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections, pooled by scheme and host.
+
+    The pool itself doesn't limit anything; callers are expected to bound
+    the number of concurrent requests per host, which in turn bounds the
+    number of connections kept per host.
+    """
+
+    def __init__(self, timeout=10, user_agent='pelican-micropub'):
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def get(self, url, headers={}):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        headers = dict(headers)
+        headers.setdefault('User-Agent', self.user_agent)
+        headers.setdefault('Accept', 'text/html')
+
+        # an idle connection may have been closed by the server in the
+        # meantime, so give a pooled connection exactly one retry
+        for attempt in range(2):
+            conn, reused = self._acquire(key)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return response.status, response.headers, body
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle = {}
+
+    def _acquire(self, key):
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                return conns.pop(), True
+        scheme, netloc = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc,
+                                               timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def _release(self, key, conn):
+        with self.lock:
+            self.idle.setdefault(key, []).append(conn)
+
+
+class ContextCache:
+    """Reply contexts persisted as JSON, with the validators we need to
+    revalidate them once they are older than the TTL.
+
+    Failed fetches are remembered too, for failure_ttl, so that a dead link
+    doesn't cost a timeout on every build.
+    """
+
+    def __init__(self, path, ttl, failure_ttl=21600):
+        self.path = path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as cache_file:
+                    self.entries = json.load(cache_file)
+            except (OSError, ValueError):
+                logger.warning('Ignoring unreadable reply context cache %s',
+                               path)
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def is_fresh(self, url, now):
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        if entry.get('failed') is not None and \
+                now - entry['failed'] < self.failure_ttl:
+            return True
+        return entry['fetched'] is not None and \
+            now - entry['fetched'] < self.ttl
+
+    def put(self, url, context, etag, last_modified, now):
+        self.entries[url] = {
+            'fetched': now,
+            'etag': etag,
+            'last_modified': last_modified,
+            'context': context,
+        }
+
+    def put_failure(self, url, now):
+        # keep whatever context we had, it's better than nothing
+        entry = self.entries.setdefault(url, {
+            'fetched': None,
+            'etag': None,
+            'last_modified': None,
+            'context': None,
+        })
+        entry['failed'] = now
+
+    def touch(self, url, now):
+        self.entries[url]['fetched'] = now
+        self.entries[url].pop('failed', None)
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as cache_file:
+            json.dump(self.entries, cache_file)
+        os.replace(tmp, self.path)
+
+
+class ContextFetcher:
+    def __init__(self, cache, concurrency=8, per_host=2, timeout=10,
+                 excerpt_length=280):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.excerpt_length = excerpt_length
+        self.pool = ConnectionPool(timeout)
+
+    def fetch_all(self, urls):
+        urls = [url for url in dict.fromkeys(urls) if url]
+        now = time.time()
+        stale = [url for url in urls if not self.cache.is_fresh(url, now)]
+        if stale:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self._fetch_many(stale))
+            finally:
+                loop.close()
+                self.pool.close()
+            self.cache.save()
+
+        contexts = {}
+        for url in urls:
+            entry = self.cache.get(url)
+            if entry and entry['context']:
+                contexts[url] = entry['context']
+        return contexts
+
+    async def _fetch_many(self, urls):
+        loop = asyncio.get_event_loop()
+        self.host_limits = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(*[self._fetch(loop, executor, url)
+                                   for url in urls])
+
+    async def _fetch(self, loop, executor, url):
+        entry = self.cache.get(url)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        # one bad target, be it a malformed URL, a bogus charset or a page
+        # we can't parse, mustn't stop the others from being fetched
+        try:
+            await self._fetch_context(loop, executor, url, entry, headers)
+        except Exception as e:
+            logger.warning('Could not fetch reply context for %s: %s', url, e)
+            self.cache.put_failure(url, time.time())
+
+    async def _fetch_context(self, loop, executor, url, entry, headers):
+        target = url
+        for _ in range(max_redirects + 1):
+            async with self._host_limit(target):
+                status, response_headers, body = \
+                    await loop.run_in_executor(executor, self.pool.get,
+                                               target, headers)
+            location = response_headers.get('Location')
+            if status in (301, 302, 303, 307, 308) and location:
+                target = urljoin(target, location)
+                continue
+            break
+
+        now = time.time()
+        if status == 304 and entry:
+            self.cache.touch(url, now)
+        elif status == 200:
+            html = decode(body, response_headers.get_content_charset())
+            context = parse_context(url, html, self.excerpt_length)
+            self.cache.put(url, context,
+                           response_headers.get('ETag'),
+                           response_headers.get('Last-Modified') or
+                           formatdate(now, usegmt=True),
+                           now)
+        else:
+            logger.warning('Could not fetch reply context for %s: HTTP %s',
+                           url, status)
+            self.cache.put_failure(url, now)
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[host]
+
+
+def get_fetcher(settings):
+    cache_path = settings.get('MICROPUB_REPLY_CONTEXT_CACHE')
+    if cache_path is None and settings.get('CACHE_PATH'):
+        cache_path = os.path.join(settings['CACHE_PATH'],
+                                  'micropub_reply_context.json')
+    cache = ContextCache(
+        cache_path, settings.get('MICROPUB_REPLY_CONTEXT_TTL', 86400),
+        settings.get('MICROPUB_REPLY_CONTEXT_FAILURE_TTL', 21600))
+    return ContextFetcher(
+        cache,
+        concurrency=settings.get('MICROPUB_REPLY_CONTEXT_CONCURRENCY', 8),
+        per_host=settings.get('MICROPUB_REPLY_CONTEXT_PER_HOST', 2),
+        timeout=settings.get('MICROPUB_REPLY_CONTEXT_TIMEOUT', 10),
+        excerpt_length=settings.get('MICROPUB_REPLY_CONTEXT_EXCERPT_LENGTH',
+                                    280))
+
+
+def attach_reply_contexts(generator):
+    settings = generator.settings
+    if not settings.get('MICROPUB_REPLY_CONTEXT'):
+        return
+
+    headers = get_content_headers(settings)
+    articles = generator.articles + generator.translations + \
+        generator.drafts + getattr(generator, 'hidden_articles', [])
+    urls = []
+    for article in articles:
+        for header in headers:
+            urls.extend(article.metadata.get(header) or [])
+
+    contexts = get_fetcher(settings).fetch_all(urls)
+
+    for article in articles:
+        reply_context = {}
+        for header in headers:
+            found = [contexts[url]
+                     for url in article.metadata.get(header) or []
+                     if url in contexts]
+            if found:
+                reply_context[header] = found
+        article.metadata['reply_context'] = reply_context
+        article.reply_context = reply_context
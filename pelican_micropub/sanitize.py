@@ -0,0 +1,183 @@
+import collections
+import hashlib
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from pelican_micropub.spill import spilling
+
+default_allowed_tags = [
+    'a', 'abbr', 'acronym', 'b', 'blockquote', 'br', 'cite', 'code', 'dd',
+    'del', 'div', 'dl', 'dt', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'li', 'mark', 'ol', 'p',
+    'pre', 's', 'small', 'span', 'strong', 'sub', 'sup', 'table', 'tbody',
+    'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+]
+
+default_allowed_attributes = {
+    '*': ['class', 'title'],
+    'a': ['href', 'rel'],
+    'abbr': ['title'],
+    'blockquote': ['cite'],
+    'img': ['src', 'alt', 'width', 'height'],
+    'td': ['colspan', 'rowspan'],
+    'th': ['colspan', 'rowspan'],
+}
+
+default_allowed_protocols = ['http', 'https', 'mailto']
+
+# Elements whose content goes along with them when they're stripped
+dropped_content_tags = {'script', 'style', 'template', 'iframe', 'object'}
+
+void_tags = {'br', 'hr', 'img', 'wbr', 'area', 'col', 'source', 'track'}
+
+url_attributes = {'href', 'src', 'cite', 'action', 'poster'}
+
+scheme_re = re.compile(r'^([a-z][a-z0-9+.\-]*):')
+
+# Browsers ignore these when parsing a URL scheme
+ignored_url_chars_re = re.compile(r'[\x00-\x20\x7f]+')
+
+
+class Policy:
+    """An allowlist, compiled into sets for fast lookups while sanitizing."""
+
+    def __init__(self, tags=None, attributes=None, protocols=None):
+        tags = default_allowed_tags if tags is None else tags
+        attributes = default_allowed_attributes if attributes is None \
+            else attributes
+        protocols = default_allowed_protocols if protocols is None \
+            else protocols
+
+        self.tags = frozenset(tags)
+        global_attributes = frozenset(attributes.get('*', []))
+        self.attributes = {}
+        for tag in self.tags:
+            self.attributes[tag] = global_attributes | \
+                frozenset(attributes.get(tag, []))
+        self.protocols = frozenset(protocols)
+        self.key = repr((sorted(self.tags),
+                         sorted((t, sorted(a))
+                                for t, a in self.attributes.items()),
+                         sorted(self.protocols)))
+
+    def allows_url(self, url):
+        match = scheme_re.match(ignored_url_chars_re.sub('', url).lower())
+        return match is None or match.group(1) in self.protocols
+
+
+class Sanitizer(HTMLParser):
+    def __init__(self, policy):
+        super().__init__(convert_charrefs=True)
+        self.policy = policy
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, tag in void_tags)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        if tag in dropped_content_tags:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # close anything left open inside this element as well
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.out.append(f'</{self.open_tags.pop()}>')
+        return ''.join(self.out)
+
+    def _start(self, tag, attrs, void):
+        if tag in dropped_content_tags:
+            if not void:
+                self.dropping += 1
+            return
+        if self.dropping or tag not in self.policy.tags:
+            return
+
+        allowed = self.policy.attributes[tag]
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed:
+                continue
+            if value is None:
+                parts.append(name)
+                continue
+            if name in url_attributes and not self.policy.allows_url(value):
+                continue
+            parts.append(f'{name}="{escape(value, quote=True)}"')
+
+        self.out.append('<' + ' '.join(parts) + '>')
+        if not void:
+            self.open_tags.append(tag)
+
+
+def sanitize(html, policy):
+    sanitizer = Sanitizer(policy)
+    sanitizer.feed(html)
+    return sanitizer.close()
+
+
+class SanitizeCache:
+    """Sanitized HTML by policy and hash of the original HTML, evicting the
+    least recently used entries once full, if given a maxsize."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def sanitize(self, html, policy):
+        key = (policy.key, hashlib.sha1(html.encode('utf-8')).digest())
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        clean = sanitize(html, policy)
+        self.entries[key] = clean
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return clean
+
+
+# maxsize -> cache
+_caches = {}
+
+# settings key -> compiled policy
+_policies = {}
+
+
+def get_policy(settings):
+    tags = settings.get('MICROPUB_SANITIZE_TAGS')
+    attributes = settings.get('MICROPUB_SANITIZE_ATTRIBUTES')
+    protocols = settings.get('MICROPUB_SANITIZE_PROTOCOLS')
+    key = repr((tags, attributes, protocols))
+    if key not in _policies:
+        _policies[key] = Policy(tags, attributes, protocols)
+    return _policies[key]
+
+
+def sanitize_html(html, settings):
+    if not html or not settings.get('MICROPUB_SANITIZE_HTML'):
+        return html
+    if spilling(settings):
+        return sanitize(html, get_policy(settings))
+    maxsize = settings.get('MICROPUB_SANITIZE_CACHE_SIZE')
+    if maxsize not in _caches:
+        _caches[maxsize] = SanitizeCache(maxsize)
+    return _caches[maxsize].sanitize(html, get_policy(settings))
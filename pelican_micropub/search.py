@@ -0,0 +1,298 @@
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import unicodedata
+
+from pelican_micropub.spill import get_body
+
+logger = logging.getLogger(__name__)
+
+# Words too common to be worth indexing
+stopwords = frozenset('''
+a about after all also am an and any are as at be because been before but
+by can could did do does for from had has have he her him his how i if in
+into is it its just me my no not of on or our out she so than that the
+their them then there these they this to too up us was we were what when
+where which who why will with would you your
+'''.split())
+
+tag_re = re.compile(r'<[^>]*>')
+
+word_re = re.compile(r'\w+', re.UNICODE)
+
+
+def html2text(content):
+    return html.unescape(tag_re.sub(' ', content or ''))
+
+
+def normalize(word):
+    # lowercase, and strip accents so that "café" and "cafe" match
+    word = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(c for c in word if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    tokens = []
+    for word in word_re.findall(text):
+        word = normalize(word)
+        if len(word) > 1 and word not in stopwords:
+            tokens.append(word)
+    return tokens
+
+
+def term_frequencies(text):
+    terms = {}
+    for token in tokenize(text):
+        terms[token] = terms.get(token, 0) + 1
+    return terms
+
+
+class SearchIndex:
+    """An inverted index of the site's content, split into shards by term
+    prefix so that a client only needs to fetch the shards matching the
+    words it is searching for.
+
+    The documents themselves (their url and title) are split into shards
+    too, by id, so that a client only fetches the ones it has results in.
+
+    The index is kept between builds, and only documents whose url, title
+    or content changed are re-indexed.  Only the shards touched by those
+    documents are rewritten.
+    """
+
+    def __init__(self, state_path=None, prefix_length=2, docs_per_shard=500,
+                 title_length=100):
+        self.state_path = state_path
+        self.prefix_length = prefix_length
+        self.docs_per_shard = docs_per_shard
+        self.title_length = title_length
+        self.docs = {}
+        self.shards = {}
+        self.next_id = 0
+        self.seen = set()
+        self.dirty = set()
+        self.dirty_docs = set()
+        self.docs_dirty = False
+
+        if state_path and os.path.exists(state_path):
+            try:
+                with open(state_path, 'r') as state_file:
+                    state = json.load(state_file)
+                if state.get('prefix_length') == prefix_length and \
+                        state.get('docs_per_shard') == docs_per_shard:
+                    docs = state['docs']
+                    shards = state['shards']
+                    next_id = state['next_id']
+                    self.docs, self.shards, self.next_id = \
+                        docs, shards, next_id
+            except (OSError, ValueError, KeyError, TypeError):
+                logger.warning('Ignoring unreadable search index state %s',
+                               state_path)
+
+    def prefix(self, term):
+        return term[:self.prefix_length]
+
+    def add(self, key, url, title, content):
+        """Index a document, unless it's unchanged since the last build.
+
+        Returns whether the document was (re-)indexed.
+        """
+        self.seen.add(key)
+        digest = hashlib.sha1(
+            '\0'.join([url, title, content]).encode('utf-8')).hexdigest()
+        doc = self.docs.get(key)
+        if doc and doc['hash'] == digest:
+            return False
+
+        if doc:
+            self._unindex(doc)
+            doc_id = doc['id']
+        else:
+            doc_id = self.next_id
+            self.next_id += 1
+
+        terms = term_frequencies(title + ' ' + html2text(content))
+        # a note's title is its whole text, which would make the documents
+        # about as big as the content itself
+        if len(title) > self.title_length:
+            title = title[:self.title_length].rsplit(' ', 1)[0] + '…'
+        doc = {'id': doc_id, 'url': url, 'title': title, 'hash': digest,
+               'terms': list(terms)}
+        for term, count in terms.items():
+            prefix = self.prefix(term)
+            shard = self.shards.setdefault(prefix, {})
+            shard.setdefault(term, {})[str(doc_id)] = count
+            self.dirty.add(prefix)
+
+        self.docs[key] = doc
+        self.dirty_docs.add(self.doc_shard(doc_id))
+        self.docs_dirty = True
+        return True
+
+    def doc_shard(self, doc_id):
+        return doc_id // self.docs_per_shard
+
+    def prune(self):
+        """Drop the documents that were not added during this build."""
+        for key in list(self.docs):
+            if key not in self.seen:
+                doc = self.docs.pop(key)
+                self._unindex(doc)
+                self.dirty_docs.add(self.doc_shard(doc['id']))
+                self.docs_dirty = True
+
+    def write(self, output_dir):
+        """Write the dirty shards (and any missing ones) to output_dir.
+
+        Returns the names of the files written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+
+        for prefix in self.dirty - set(self.shards):
+            path = os.path.join(output_dir, prefix + '.json')
+            if os.path.exists(path):
+                os.remove(path)
+
+        for prefix, shard in self.shards.items():
+            name = prefix + '.json'
+            path = os.path.join(output_dir, name)
+            if prefix not in self.dirty and os.path.exists(path):
+                continue
+            postings = {}
+            for term, docs in shard.items():
+                flat = []
+                for doc_id, count in docs.items():
+                    flat.extend([int(doc_id), count])
+                postings[term] = flat
+            _write_json(path, postings)
+            written.append(name)
+
+        doc_shards = {}
+        for doc in self.docs.values():
+            shard = doc_shards.setdefault(self.doc_shard(doc['id']), {})
+            shard[doc['id']] = [doc['url'], doc['title']]
+
+        docs_dir = os.path.join(output_dir, 'docs')
+        os.makedirs(docs_dir, exist_ok=True)
+        # left over from before the documents were sharded
+        if os.path.exists(os.path.join(output_dir, 'docs.json')):
+            os.remove(os.path.join(output_dir, 'docs.json'))
+        for number in self.dirty_docs - set(doc_shards):
+            path = os.path.join(docs_dir, f'{number}.json')
+            if os.path.exists(path):
+                os.remove(path)
+
+        for number, docs in doc_shards.items():
+            name = f'docs/{number}.json'
+            path = os.path.join(output_dir, name)
+            if number not in self.dirty_docs and os.path.exists(path):
+                continue
+            _write_json(path, docs)
+            written.append(name)
+
+        index_path = os.path.join(output_dir, 'index.json')
+        if self.docs_dirty or not os.path.exists(index_path):
+            _write_json(index_path, {
+                'prefix_length': self.prefix_length,
+                'docs_per_shard': self.docs_per_shard,
+                'shards': sorted(self.shards),
+                'doc_shards': sorted(doc_shards),
+            })
+            written.append('index.json')
+
+        self.dirty = set()
+        self.dirty_docs = set()
+        self.docs_dirty = False
+        return written
+
+    def save(self):
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _write_json(self.state_path, {
+            'prefix_length': self.prefix_length,
+            'docs_per_shard': self.docs_per_shard,
+            'next_id': self.next_id,
+            'docs': self.docs,
+            'shards': self.shards,
+        })
+
+    def _unindex(self, doc):
+        doc_id = str(doc['id'])
+        for term in doc['terms']:
+            prefix = self.prefix(term)
+            shard = self.shards.get(prefix, {})
+            postings = shard.get(term, {})
+            postings.pop(doc_id, None)
+            if not postings:
+                shard.pop(term, None)
+            if not shard:
+                self.shards.pop(prefix, None)
+            self.dirty.add(prefix)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as json_file:
+        json.dump(data, json_file, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# One index per output path, alive from the first generator feeding it
+# until the build is finalized
+_indexes = {}
+
+
+def get_index(settings):
+    output_path = settings.get('OUTPUT_PATH', '')
+    if output_path not in _indexes:
+        state_path = None
+        if settings.get('CACHE_PATH'):
+            state_path = os.path.join(settings['CACHE_PATH'],
+                                      'micropub_search_index.json')
+        _indexes[output_path] = SearchIndex(
+            state_path, settings.get('MICROPUB_SEARCH_PREFIX_LENGTH', 2),
+            settings.get('MICROPUB_SEARCH_DOCS_PER_SHARD', 500),
+            settings.get('MICROPUB_SEARCH_TITLE_LENGTH', 100))
+    return _indexes[output_path]
+
+
+def index_contents(settings, contents):
+    if not settings.get('MICROPUB_SEARCH_INDEX'):
+        return
+
+    index = get_index(settings)
+    for content in contents:
+        index.add(content.get_relative_source_path(), content.url,
+                  content.title, get_body(content))
+
+
+def index_articles(generator):
+    index_contents(generator.settings,
+                   generator.articles + generator.translations)
+
+
+def index_pages(generator):
+    index_contents(generator.settings,
+                   generator.pages + generator.translations)
+
+
+def write_search_index(pelican):
+    settings = pelican.settings
+    search_dir = settings.get('MICROPUB_SEARCH_INDEX')
+    if not search_dir:
+        return
+    if search_dir is True:
+        search_dir = 'search'
+
+    index = get_index(settings)
+    index.prune()
+    index.write(os.path.join(pelican.output_path, search_dir))
+    index.save()
+    del _indexes[settings.get('OUTPUT_PATH', '')]
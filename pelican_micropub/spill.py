@@ -0,0 +1,148 @@
+import hashlib
+import os
+
+
+class BodyStore:
+    """Rendered bodies on disk, one file per body, named after its hash.
+
+    Since the name only depends on the body, a body written by an earlier
+    build is still good for any cached reader output that refers to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def put(self, body):
+        key = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        path = self._path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as body_file:
+                body_file.write(body)
+            os.replace(tmp, path)
+        return key
+
+    def get(self, key):
+        with open(self._path(key), 'r', encoding='utf-8') as body_file:
+            return body_file.read()
+
+    def prune(self, keep):
+        """Delete the bodies whose keys aren't in keep."""
+        if not os.path.isdir(self.path):
+            return
+        for prefix in os.listdir(self.path):
+            directory = os.path.join(self.path, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith('.html') or \
+                        prefix + name[:-len('.html')] not in keep:
+                    os.remove(os.path.join(directory, name))
+            if not os.listdir(directory):
+                os.rmdir(directory)
+
+    def _path(self, key):
+        return os.path.join(self.path, key[:2], key[2:] + '.html')
+
+
+def spilling(settings):
+    """Whether bodies should be kept out of memory, which also means not
+    keeping the posts they come from in any in-process cache."""
+    return bool(settings.get('MICROPUB_SPILL_CONTENT'))
+
+
+def get_store_path(settings):
+    path = settings.get('MICROPUB_SPILL_PATH')
+    if path is None:
+        path = os.path.join(settings.get('CACHE_PATH', 'cache'),
+                            'micropub_bodies')
+    return path
+
+
+def spill(html, metadata, settings):
+    """Move a rendered body to disk, if MICROPUB_SPILL_CONTENT is set.
+
+    The reader then hands Pelican an empty body, and the key needed to load
+    the real one back in the 'spilled_content' metadata.  A note's title is
+    its whole text, so it is cut down to MICROPUB_SPILL_TITLE_LENGTH too.
+    """
+    if not spilling(settings):
+        return html, metadata
+
+    title = metadata.get('title')
+    length = settings.get('MICROPUB_SPILL_TITLE_LENGTH', 100)
+    if isinstance(title, str) and len(title) > length:
+        metadata['title'] = title[:length].rsplit(' ', 1)[0] + '…'
+
+    if html:
+        metadata['spilled_content'] = \
+            BodyStore(get_store_path(settings)).put(html)
+        html = ''
+    return html, metadata
+
+
+class SpilledContent:
+    """Stands in for a content object's get_content, loading the body from
+    disk on every call rather than keeping it around like Pelican does."""
+
+    def __init__(self, content, store_path, key):
+        self.content = content
+        self.store_path = store_path
+        self.key = key
+
+    def __call__(self, siteurl):
+        body = BodyStore(self.store_path).get(self.key)
+        return self.content._update_content(body, siteurl)
+
+
+def attach_spilled_content(instance):
+    key = getattr(instance, 'metadata', {}).get('spilled_content')
+    if not key:
+        return
+
+    instance.get_content = SpilledContent(
+        instance, get_store_path(instance.settings), key)
+
+
+# store path -> keys of the bodies the contents of this build refer to
+_used = {}
+
+# what the article and page generators keep their contents in
+content_lists = ('articles', 'pages', 'translations', 'drafts',
+                 'drafts_translations', 'hidden_pages', 'hidden_translations',
+                 'draft_pages', 'draft_translations')
+
+
+def collect_spilled_content(generator):
+    """Note the bodies the generator's contents refer to.
+
+    Contents loaded from Pelican's cache never go through spill, so they
+    are looked for here, once the generator is done.
+    """
+    settings = generator.settings
+    if not spilling(settings):
+        return
+
+    used = _used.setdefault(get_store_path(settings), set())
+    for name in content_lists:
+        for content in getattr(generator, name, []):
+            key = content.metadata.get('spilled_content')
+            if key:
+                used.add(key)
+
+
+def prune_spilled_content(pelican):
+    """Delete the bodies no content of this build referred to."""
+    if not spilling(pelican.settings):
+        return
+    path = get_store_path(pelican.settings)
+    BodyStore(path).prune(_used.pop(path, set()))
+
+
+def get_body(content):
+    """The body a reader produced for a content object, spilled or not."""
+    get_content = content.__dict__.get('get_content')
+    if isinstance(get_content, SpilledContent):
+        return BodyStore(get_content.store_path).get(get_content.key)
+    return content._content or ''
@@ -0,0 +1,95 @@
+"""Parse micropub and notedown entries outside of Pelican.
+
+``iter_entries`` lazily yields one ``Entry(path, html, metadata)`` per
+file.  The metadata is what the readers hand to Pelican *before* Pelican
+processes it, so dates are left as strings, for instance.
+"""
+import collections
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from pelican_micropub.micropub import read_micropub, read_notedown, \
+    adjust_metadata
+
+logger = logging.getLogger(__name__)
+
+Entry = collections.namedtuple('Entry', ['path', 'html', 'metadata'])
+
+entry_readers = {
+    '.mp': read_micropub,
+    '.nd': read_notedown,
+}
+
+
+def iter_paths(paths_or_dir):
+    """Yield every entry file under the given directory, or among the
+    given paths, in a stable order."""
+    if isinstance(paths_or_dir, str):
+        paths_or_dir = [paths_or_dir]
+
+    for path in paths_or_dir:
+        if not os.path.isdir(path):
+            if os.path.splitext(path)[1] in entry_readers:
+                yield path
+            continue
+        for dirpath, dirs, filenames in os.walk(path, followlinks=True):
+            dirs.sort()
+            for name in sorted(filenames):
+                if os.path.splitext(name)[1] in entry_readers:
+                    yield os.path.join(dirpath, name)
+
+
+def read_entry_file(path, settings={}):
+    reader = entry_readers[os.path.splitext(path)[1]]
+    html, metadata, shared = reader(path, settings)
+    return Entry(path, html, adjust_metadata(metadata, shared.text, settings,
+                                             shared.extracted))
+
+
+def iter_entries(paths_or_dir, settings=None, workers=None, ordered=True):
+    """Lazily parse entries.
+
+    With ``workers``, entries are parsed in that many processes, with at
+    most twice as many files in flight at once.  Entries come out in path
+    order unless ``ordered`` is false, in which case they come out as soon
+    as they are parsed.  Files that can't be parsed are logged and skipped.
+    """
+    settings = settings or {}
+    paths = iter_paths(paths_or_dir)
+
+    if not workers:
+        for path in paths:
+            try:
+                yield read_entry_file(path, settings)
+            except Exception:
+                logger.exception('Could not process %s', path)
+        return
+
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.OrderedDict()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < window:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                else:
+                    future = executor.submit(read_entry_file, path, settings)
+                    pending[future] = path
+
+            if not pending:
+                break
+
+            if ordered:
+                done = [next(iter(pending))]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception:
+                    logger.exception('Could not process %s', path)
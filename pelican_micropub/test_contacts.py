@@ -0,0 +1,131 @@
+import json
+import logging
+
+from pelican_micropub.contacts import ContactTrie, build_contacts, \
+    load_contacts, get_contacts, forget_contacts, resolve_mentions
+from pelican_micropub.micropub import micropub2pelican, adjust_metadata
+
+
+def make_card(nicknames, url, name=None, photo=None):
+    props = {'nickname': nicknames, 'url': [url]}
+    if name:
+        props['name'] = [name]
+    if photo:
+        props['photo'] = [photo]
+    return {'type': ['h-card'], 'properties': props}
+
+
+cards = [
+    make_card(['bob', 'bobby_t'], 'https://bob.com', 'Bob',
+              'https://bob.com/me.jpg'),
+    make_card(['alice'], 'https://alice.net'),
+    make_card(['nourl'], ''),
+    {'type': ['h-entry'], 'properties': {'nickname': ['entry'],
+                                         'url': ['https://e.com']}},
+]
+
+
+def write_contacts(tmpdir, data):
+    path = str(tmpdir.join('contacts.json'))
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return path
+
+
+def test_should_find_exact_nickname():
+    contacts = build_contacts(cards)
+    assert contacts.get('bob')['url'] == 'https://bob.com'
+    assert contacts.get('BOB')['name'] == 'Bob'
+    assert contacts.get('bobby_t')['photo'] == 'https://bob.com/me.jpg'
+    assert contacts.get('bo') is None
+
+
+def test_should_skip_cards_without_url_and_non_cards():
+    contacts = build_contacts(cards)
+    assert contacts.get('nourl') is None
+    assert contacts.get('entry') is None
+
+
+def test_should_match_longest_prefix_on_word_boundary():
+    contacts = build_contacts(cards)
+    assert contacts.longest_prefix("bob's")[0] == 3
+    assert contacts.longest_prefix('bobby_t.')[0] == 7
+    assert contacts.longest_prefix('bobby') == (0, None)
+
+
+def test_should_index_many_nicknames():
+    contacts = ContactTrie()
+    for i in range(1000):
+        contacts.add('user%d' % i, {'url': 'https://%d.com' % i})
+    assert contacts.get('user999')['url'] == 'https://999.com'
+    assert contacts.get('user1000') is None
+
+
+def test_should_load_contacts_list(tmpdir):
+    contacts = load_contacts(write_contacts(tmpdir, cards))
+    assert contacts.get('alice')['url'] == 'https://alice.net'
+
+
+def test_should_load_parsed_mf2(tmpdir):
+    path = write_contacts(tmpdir, {'items': cards})
+    assert load_contacts(path).get('alice')['url'] == 'https://alice.net'
+
+
+def test_should_load_contacts_once_per_build(tmpdir):
+    settings = {'NOTEDOWN_CONTACTS': write_contacts(tmpdir, cards)}
+    forget_contacts(None)
+    assert get_contacts(settings) is get_contacts(settings)
+    contacts = get_contacts(settings)
+    forget_contacts(None)
+    assert get_contacts(settings) is not contacts
+
+
+def test_should_report_missing_contacts_once(tmpdir, caplog):
+    settings = {'NOTEDOWN_CONTACTS': str(tmpdir.join('missing.json')),
+                'NOTEDOWN_MENTION_TEMPLATE': 'https://twitter.com/{mention}'}
+    forget_contacts(None)
+    with caplog.at_level(logging.ERROR):
+        for _ in range(3):
+            html, metadata = micropub2pelican({
+                "type": ["h-entry"],
+                "properties": {
+                    "content": ["hi @alice"],
+                    "published": ["2019-08-29T02:03:05.429827"]
+                }
+            }, settings)
+            assert 'https://twitter.com/alice' in html
+    assert len(caplog.records) == 1
+    forget_contacts(None)
+
+
+def test_should_resolve_mentions():
+    contacts = build_contacts(cards)
+    resolved = resolve_mentions(['bob', 'carol', 'alice', 'bobby_t'],
+                                contacts)
+    assert [card['url'] for card in resolved] == \
+        ['https://bob.com', 'https://alice.net']
+
+
+def test_should_link_mentions_in_notes(tmpdir):
+    post = {
+        "type": ["h-entry"],
+        "properties": {
+            "content": ["hi @alice and @carol"],
+            "published": ["2019-08-29T02:03:05.429827"]
+        }
+    }
+    settings = {
+        'NOTEDOWN_CONTACTS': write_contacts(tmpdir, cards),
+        'NOTEDOWN_MENTION_TEMPLATE': 'https://twitter.com/{mention}'
+    }
+    html, metadata = micropub2pelican(post, settings)
+    assert html == 'hi <a href="https://alice.net">@alice</a> and ' + \
+        '<a href="https://twitter.com/carol">@carol</a>'
+
+    metadata = adjust_metadata(metadata, 'hi @alice and @carol', settings)
+    assert metadata['mention_cards'] == [{
+        'nickname': 'alice',
+        'name': None,
+        'url': 'https://alice.net',
+        'photo': None
+    }]
@@ -0,0 +1,70 @@
+import datetime
+
+from pelican_micropub.dateindex import PostTypeIndex, build_post_type_index
+
+
+class Article(object):
+    def __init__(self, name, post_type, date):
+        self.name = name
+        self.post_type = post_type
+        self.date = datetime.datetime.strptime(date, '%Y-%m-%d')
+
+
+class Generator(object):
+    def __init__(self, articles):
+        self.articles = articles
+        self.context = {}
+
+
+def make_index():
+    return PostTypeIndex([
+        Article('n1', 'note', '2019-08-01'),
+        Article('l1', 'like', '2019-08-02'),
+        Article('n3', 'note', '2019-09-15'),
+        Article('n2', 'note', '2019-08-20'),
+        Article('x', None, '2019-08-20'),
+    ])
+
+
+def names(articles):
+    return [a.name for a in articles]
+
+
+def test_should_sort_by_date_newest_first():
+    index = make_index()
+    assert names(index.latest('note')) == ['n3', 'n2', 'n1']
+    assert names(index['note']) == ['n3', 'n2', 'n1']
+
+
+def test_should_return_latest_n():
+    index = make_index()
+    assert names(index.latest('note', 2)) == ['n3', 'n2']
+
+
+def test_should_list_post_types():
+    assert make_index().post_types() == ['like', 'note']
+
+
+def test_should_bucket_by_month():
+    index = make_index()
+    assert index.months('note') == [(2019, 9), (2019, 8)]
+    assert names(index.month('note', 2019, 8)) == ['n2', 'n1']
+
+
+def test_should_keep_order_of_same_date_articles():
+    index = PostTypeIndex([Article('a', 'note', '2019-08-01'),
+                           Article('b', 'note', '2019-08-01')])
+    assert names(index.latest('note')) == ['a', 'b']
+
+
+def test_should_handle_unknown_post_type():
+    index = make_index()
+    assert index.latest('photo', 5) == []
+    assert index.months('photo') == []
+    assert index.month('photo', 2019, 8) == []
+
+
+def test_should_add_index_to_context():
+    generator = Generator([Article('n1', 'note', '2019-08-01')])
+    build_post_type_index(generator)
+    assert names(generator.context['micropub_posts'].latest('note')) == ['n1']
@@ -0,0 +1,143 @@
+import datetime
+
+from pelican_micropub.duplicates import fingerprint, find_duplicates, \
+    collapse_duplicates
+from pelican_micropub.micropub import micropub2pelican
+
+
+def make_post(content, published, slug=None):
+    post = {
+        "type": ["h-entry"],
+        "properties": {
+            "content": [content],
+            "published": [published]
+        }
+    }
+    if slug:
+        post['properties']['mp-slug'] = [slug]
+    return post
+
+
+class Article(object):
+    def __init__(self, source_path, content, date):
+        self.source_path = source_path
+        self.fingerprint = fingerprint(make_post(content, date))
+        self.date = datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M')
+        self.status = 'published'
+
+    def get_relative_source_path(self):
+        return self.source_path
+
+
+class Generator(object):
+    def __init__(self, settings, articles):
+        self.settings = settings
+        self.articles = articles
+        self.drafts = []
+        self.hidden_articles = []
+        self.context = {'generated_content': {
+            a.source_path: a for a in articles}}
+
+
+def make_articles():
+    return [
+        Article('b.mp', 'hello', '2019-08-01T10:01'),
+        Article('a.mp', 'hello', '2019-08-01T10:00'),
+        Article('c.mp', 'goodbye', '2019-08-01T10:00'),
+        Article('d.mp', '  hello ', '2019-08-01T10:05'),
+    ]
+
+
+def test_should_ignore_published_and_slug():
+    assert fingerprint(make_post('hi', '2019-08-29T02:03:05.429827')) == \
+        fingerprint(make_post('hi', '2019-08-29T02:03:09.429827', 'slug'))
+
+
+def test_should_normalize_whitespace():
+    assert fingerprint(make_post('hi  there\n', '2019-08-29')) == \
+        fingerprint(make_post('hi there', '2019-08-29'))
+
+
+def test_should_distinguish_content():
+    assert fingerprint(make_post('hi', '2019-08-29')) != \
+        fingerprint(make_post('bye', '2019-08-29'))
+
+
+def test_should_not_fingerprint_empty_post():
+    assert fingerprint({'properties': {'published': ['2019-08-29']}}) is None
+
+
+def test_should_add_fingerprint_to_metadata():
+    html, metadata = micropub2pelican(
+        make_post('hi', '2019-08-29T02:03:05.429827'))
+    assert metadata['fingerprint'] == \
+        fingerprint(make_post('hi', '2019-08-29T02:03:05.429827'))
+
+
+def test_should_keep_earliest_copy():
+    duplicates = find_duplicates(make_articles())
+    pairs = [(d.source_path, o.source_path) for d, o in duplicates]
+    assert pairs == [('b.mp', 'a.mp'), ('d.mp', 'a.mp')]
+
+
+def test_should_keep_same_post_on_different_days():
+    articles = [
+        Article('a.mp', 'good morning', '2019-08-01T08:00'),
+        Article('b.mp', 'good morning', '2019-08-02T08:00'),
+        Article('c.mp', 'good morning', '2019-08-02T08:03'),
+    ]
+    pairs = [(d.source_path, o.source_path)
+             for d, o in find_duplicates(articles)]
+    assert pairs == [('c.mp', 'b.mp')]
+
+
+def test_should_measure_window_from_original():
+    articles = [
+        Article('a.mp', 'hi', '2019-08-01T08:00'),
+        Article('b.mp', 'hi', '2019-08-01T08:08'),
+        Article('c.mp', 'hi', '2019-08-01T08:16'),
+    ]
+    pairs = [(d.source_path, o.source_path)
+             for d, o in find_duplicates(articles)]
+    assert pairs == [('b.mp', 'a.mp')]
+
+
+def test_should_only_report_duplicates():
+    generator = Generator({'MICROPUB_DUPLICATES': 'report'},
+                          make_articles())
+    collapse_duplicates(generator)
+    assert len(generator.articles) == 4
+    assert generator.articles[0].duplicate_of.source_path == 'a.mp'
+
+
+def test_should_demote_duplicates_to_drafts():
+    generator = Generator({'MICROPUB_DUPLICATES': 'draft'}, make_articles())
+    collapse_duplicates(generator)
+    assert [a.source_path for a in generator.articles] == ['a.mp', 'c.mp']
+    assert [a.source_path for a in generator.drafts] == ['b.mp', 'd.mp']
+    assert generator.drafts[0].status == 'draft'
+
+
+def test_should_hide_duplicates():
+    generator = Generator({'MICROPUB_DUPLICATES': 'hidden'}, make_articles())
+    collapse_duplicates(generator)
+    assert [a.source_path for a in generator.hidden_articles] == \
+        ['b.mp', 'd.mp']
+
+
+def test_should_drop_duplicates():
+    generator = Generator({'MICROPUB_DUPLICATES': 'drop'}, make_articles())
+    collapse_duplicates(generator)
+    assert [a.source_path for a in generator.articles] == ['a.mp', 'c.mp']
+    assert generator.drafts == []
+    assert generator.hidden_articles == []
+    generated = generator.context['generated_content']
+    assert generated['b.mp'].source_path == 'a.mp'
+    assert generated['d.mp'].source_path == 'a.mp'
+
+
+def test_should_do_nothing_unless_enabled():
+    generator = Generator({}, make_articles())
+    collapse_duplicates(generator)
+    assert len(generator.articles) == 4
+    assert not hasattr(generator.articles[0], 'duplicate_of')
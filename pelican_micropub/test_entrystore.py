@@ -0,0 +1,147 @@
+import json
+import os
+
+import pelican_micropub.micropub as micropub
+from pelican_micropub.entrystore import EntryStore, shared_entries
+from pelican_micropub.micropub import read_micropub, read_notedown, \
+    adjust_metadata
+
+
+def write_note(tmpdir, content='hello #there @bob'):
+    filename = str(tmpdir.join('note.mp'))
+    with open(filename, 'w') as f:
+        json.dump({
+            "type": ["h-entry"],
+            "properties": {
+                "content": [content],
+                "published": ["2019-08-29T02:03:05.429827"]
+            }
+        }, f)
+    return filename
+
+
+def test_should_reuse_loaded_entry(tmpdir):
+    filename = write_note(tmpdir)
+    store = EntryStore()
+    loads = []
+    first = store.get(filename, lambda f: loads.append(f) or object())
+    assert store.get(filename, lambda f: object()) is first
+    assert loads == [filename]
+
+
+def test_should_reload_changed_entry(tmpdir):
+    filename = write_note(tmpdir)
+    store = EntryStore()
+    first = store.get(filename, lambda f: object())
+    write_note(tmpdir, 'hello again, longer this time')
+    assert store.get(filename, lambda f: object()) is not first
+
+
+def test_should_reload_when_dependency_changes(tmpdir):
+    filename = write_note(tmpdir)
+    dependency = str(tmpdir.join('note.mp.ops'))
+    store = EntryStore()
+    first = store.get(filename, lambda f: object(), dependency)
+    tmpdir.join('note.mp.ops').write('{}\n')
+    assert store.get(filename, lambda f: object(), dependency) is not first
+
+
+def test_should_share_parse_between_sites(tmpdir, monkeypatch):
+    filename = write_note(tmpdir)
+    shared_entries.clear()
+    interpreted = []
+    interpret_post = micropub.interpret_post
+    monkeypatch.setattr(micropub, 'interpret_post',
+                        lambda post: interpreted.append(post) or
+                        interpret_post(post))
+
+    main = {'NOTEDOWN_HASHTAG_TEMPLATE': 'https://main.com/{hashtag}',
+            'MICROPUB_CATEGORY_MAP': {'note': 'notes'},
+            'MICROPUB_SHARE_ENTRIES': True}
+    mirror = {'NOTEDOWN_HASHTAG_TEMPLATE': 'https://mirror.com/{hashtag}',
+              'MICROPUB_SHARE_ENTRIES': True}
+    main_html, main_metadata, main_shared = read_micropub(filename, main)
+    mirror_html, mirror_metadata, mirror_shared = read_micropub(filename,
+                                                                mirror)
+
+    assert len(interpreted) == 1
+    assert main_shared is mirror_shared
+    assert main_shared.extracted['hashtags'] == ['there']
+    assert 'https://main.com/there' in main_html
+    assert 'https://mirror.com/there' in mirror_html
+    assert main_metadata['category'] == 'notes'
+    assert 'category' not in mirror_metadata
+
+
+def test_should_not_leak_metadata_between_sites(tmpdir):
+    filename = str(tmpdir.join('note.nd'))
+    with open(filename, 'w') as f:
+        f.write('title: Hi\n\nhello')
+    shared_entries.clear()
+
+    html, metadata, shared = read_notedown(
+        filename, {'MICROPUB_CATEGORY_MAP': {'article': 'blog'},
+                   'MICROPUB_SHARE_ENTRIES': True})
+    metadata['extra'] = 'x'
+    html, metadata, shared = read_notedown(
+        filename, {'MICROPUB_SHARE_ENTRIES': True})
+    assert 'category' not in metadata
+    assert 'extra' not in metadata
+    assert os.path.realpath(filename) in shared_entries.entries
+
+
+def test_should_not_share_mutable_metadata(tmpdir):
+    filename = str(tmpdir.join('note.mp'))
+    with open(filename, 'w') as f:
+        json.dump({
+            "type": ["h-entry"],
+            "properties": {
+                "content": ["hello"],
+                "category": ["tag1"],
+                "mp-syndicate-to": ["https://twitter.com"],
+                "photo": [{"value": "https://example.com/a.jpg",
+                           "alt": "a"}],
+                "author": [{"type": ["h-card"],
+                            "properties": {"name": ["Jane"]}}],
+                "published": ["2019-08-29T02:03:05.429827"]
+            }
+        }, f)
+    shared_entries.clear()
+    settings = {'MICROPUB_SHARE_ENTRIES': True}
+
+    html, metadata, shared = read_micropub(filename, settings)
+    metadata['tags'].append('tag2')
+    metadata['mp_syndicate_to'].clear()
+    metadata['photo'][0]['alt'] = 'changed'
+    metadata['author-full']['name'] = 'changed'
+
+    html, metadata, shared = read_micropub(filename, settings)
+    assert metadata['tags'] == ['tag1']
+    assert metadata['mp_syndicate_to'] == ['https://twitter.com']
+    assert metadata['photo'][0]['alt'] == 'a'
+    assert metadata['author-full']['name'] == 'Jane'
+
+
+def test_should_not_share_extracted_metadata(tmpdir):
+    filename = write_note(tmpdir, 'hello #a @bob https://example.com')
+    shared_entries.clear()
+    settings = {'MICROPUB_SHARE_ENTRIES': True}
+
+    for _ in range(2):
+        html, metadata, shared = read_micropub(filename, settings)
+        metadata = adjust_metadata(metadata, shared.text, settings,
+                                   shared.extracted)
+        assert metadata['hashtags'] == ['a']
+        assert metadata['mentions'] == ['bob']
+        assert metadata['links'] == ['https://example.com']
+        metadata['hashtags'].append('leaked')
+        metadata['mentions'].append('leaked')
+        metadata['links'].append('leaked')
+
+
+def test_should_not_keep_entries_unless_sharing(tmpdir):
+    filename = write_note(tmpdir)
+    shared_entries.clear()
+    first = read_micropub(filename, {})[2]
+    assert read_micropub(filename, {})[2] is not first
+    assert shared_entries.entries == {}
@@ -0,0 +1,157 @@
+import copy
+import json
+import subprocess
+
+import pytest
+from pelican.settings import DEFAULT_CONFIG
+
+import pelican_micropub.gitsource as gitsource
+from pelican_micropub.gitsource import list_tree, read_blobs, \
+    iter_git_entries, add_git_articles
+
+
+def git(cwd, *args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c',
+                    'user.email=test@example.com'] + list(args),
+                   cwd=cwd, check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+
+
+def make_post(content, published='2019-08-29T02:03:05.429827'):
+    return json.dumps({
+        "type": ["h-entry"],
+        "properties": {
+            "content": [content],
+            "published": [published]
+        }
+    })
+
+
+def make_repo(tmpdir, files):
+    work = tmpdir.mkdir('work')
+    git(str(work), 'init', '-q')
+    for name, contents in files.items():
+        work.join(name).write(contents, ensure=True)
+    git(str(work), 'add', '.')
+    git(str(work), 'commit', '-q', '-m', 'entries')
+
+    bare = str(tmpdir.join('bare.git'))
+    git(str(tmpdir), 'clone', '-q', '--bare', str(work), bare)
+    gitsource._shared.clear()
+    return bare
+
+
+@pytest.fixture
+def repo(tmpdir):
+    return make_repo(tmpdir, {
+        'notes/a.mp': make_post('first #one'),
+        'notes/b.mp': make_post('second', '2019-08-30T02:03:05.429827'),
+        'notes/b.mp.ops': json.dumps({
+            'action': 'update',
+            'replace': {'content': ['second, edited']}
+        }) + '\n',
+        'notes/c.nd': 'title: Third\ndate: 2019-08-28\n\nthird post',
+        'README.md': 'not an entry',
+    })
+
+
+class Generator(object):
+    def __init__(self, settings):
+        self.settings = settings
+        self.context = {}
+        self.articles = []
+        self.translations = []
+        self.drafts = []
+        self.drafts_translations = []
+        self.hidden_articles = []
+        self.hidden_translations = []
+        self.source_paths = []
+
+    def add_source_path(self, content):
+        self.source_paths.append(content.source_path)
+
+    def add_static_links(self, content):
+        pass
+
+
+def test_should_list_tree(repo):
+    blobs = list_tree(repo)
+    assert sorted(blobs) == ['README.md', 'notes/a.mp', 'notes/b.mp',
+                             'notes/b.mp.ops', 'notes/c.nd']
+    assert sorted(list_tree(repo, path='notes')) == \
+        ['notes/a.mp', 'notes/b.mp', 'notes/b.mp.ops', 'notes/c.nd']
+
+
+def test_should_read_blobs(repo):
+    blobs = list_tree(repo)
+    contents = read_blobs(repo, [blobs['README.md'], blobs['notes/c.nd']])
+    assert contents[blobs['README.md']] == b'not an entry'
+    assert contents[blobs['notes/c.nd']].endswith(b'third post')
+
+
+def test_should_read_entries(repo):
+    entries = list(iter_git_entries(repo))
+    assert [e.path for e in entries] == \
+        ['notes/a.mp', 'notes/b.mp', 'notes/c.nd']
+    assert entries[0].html == 'first #one'
+    assert entries[0].metadata['hashtags'] == ['one']
+    assert entries[1].html == 'second, edited'
+    assert entries[2].metadata['title'] == 'Third'
+
+
+def test_should_not_reread_unchanged_entries(repo, monkeypatch):
+    settings = {'MICROPUB_SHARE_ENTRIES': True}
+    list(iter_git_entries(repo, settings=settings))
+    read = []
+    monkeypatch.setattr(gitsource, 'read_blobs',
+                        lambda repo, oids: read.extend(oids) or {})
+    assert len(list(iter_git_entries(repo, settings=settings))) == 3
+    assert read == []
+
+
+def test_should_not_keep_entries_unless_sharing(repo):
+    list(iter_git_entries(repo))
+    assert gitsource._shared == {}
+
+
+def test_should_forget_entries_no_longer_in_tree(repo):
+    settings = {'MICROPUB_SHARE_ENTRIES': True}
+    list(iter_git_entries(repo, settings=settings))
+    assert len(gitsource._shared) == 3
+    list(iter_git_entries(repo, path='notes/a.mp', settings=settings))
+    assert len(gitsource._shared) == 1
+
+
+def test_should_add_git_articles(repo):
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings['MICROPUB_GIT_REPO'] = repo
+    generator = Generator(settings)
+    add_git_articles(generator)
+    assert [a.content for a in generator.articles] == \
+        ['second, edited', 'first #one', 'third post']
+    assert generator.articles[0].date.day == 30
+    assert len(generator.source_paths) == 3
+
+
+def test_should_not_add_git_articles_unless_enabled():
+    generator = Generator(copy.deepcopy(DEFAULT_CONFIG))
+    add_git_articles(generator)
+    assert generator.articles == []
+
+
+def test_should_process_git_translations_and_drafts(tmpdir):
+    repo = make_repo(tmpdir, {
+        'hello.nd': 'title: Hello\ndate: 2019-08-28\nslug: hello\n\nhi',
+        'bonjour.nd': 'title: Bonjour\ndate: 2019-08-28\nslug: hello\n'
+                      'lang: fr\n\nsalut',
+        'draft.nd': 'title: Draft\ndate: 2019-08-29\nstatus: draft\n\nwip',
+        'invalid.nd': 'date: 2019-08-29\nslug: invalid\nstatus: nope\n\nx',
+    })
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings['MICROPUB_GIT_REPO'] = repo
+    generator = Generator(settings)
+    add_git_articles(generator)
+    assert [a.title for a in generator.articles] == ['Hello']
+    assert [a.title for a in generator.translations] == ['Bonjour']
+    assert generator.articles[0].translations == generator.translations
+    assert [a.title for a in generator.drafts] == ['Draft']
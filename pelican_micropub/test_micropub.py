@@ -316,3 +316,10 @@ def test_should_split_content_headers():
     init_micropub_metadata(Generator(settings), metadata)
     assert metadata['in_reply_to'] == ['hello', 'goodbye']
     assert metadata['like_of'] == ['blah', 'stuff']
+
+
+def test_should_still_export_readers():
+    from pelican_micropub.micropub import MicropubReader, NotedownReader
+    from pelican_micropub import readers
+    assert MicropubReader is readers.MicropubReader
+    assert NotedownReader is readers.NotedownReader
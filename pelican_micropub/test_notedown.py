@@ -124,3 +124,33 @@ def test_should_convert_all_the_things():
         '<a href="https://twitter/hashtags/stuff">#stuff</a> ' + \
         '<a href="https://twitter/users/blah">@blah</a> ' + \
         '<a href="http://me.com">http://me.com</a> &nbsp;&nbsp;nice'
+
+
+class Contacts(object):
+    def __init__(self, cards):
+        self.cards = cards
+
+    def longest_prefix(self, text):
+        for nickname, card in self.cards.items():
+            if text.startswith(nickname):
+                return len(nickname), card
+        return 0, None
+
+
+def test_mention_linked_to_contact():
+    contacts = Contacts({'bob': {'url': 'https://bob.com'}})
+    htext = convert2html('hello @bob, bye', False, None, None, contacts)
+    assert htext == 'hello <a href="https://bob.com">@bob</a>, bye'
+
+
+def test_unknown_mention_falls_back_on_template():
+    contacts = Contacts({'bob': {'url': 'https://bob.com'}})
+    htext = convert2html('hello @alice', False, None,
+                         'https://twitter/users/{mention}', contacts)
+    assert htext == 'hello <a href="https://twitter/users/alice">@alice</a>'
+
+
+def test_unknown_mention_left_alone_without_template():
+    contacts = Contacts({'bob': {'url': 'https://bob.com'}})
+    htext = convert2html('hello @alice', False, None, None, contacts)
+    assert htext == 'hello @alice'
@@ -0,0 +1,143 @@
+import json
+import os
+
+import pytest
+
+import pelican_micropub.oplog as oplog
+from pelican_micropub.oplog import append_operation, apply_operations, \
+    read_entry, compact, compact_tree, ops_path
+
+
+def write_entry(tmpdir, name='entry.mp'):
+    post = {
+        "type": ["h-entry"],
+        "properties": {
+            "content": ["hello"],
+            "category": ["tag1", "tag2"],
+            "published": ["2019-08-29T02:03:05.429827"]
+        }
+    }
+    filename = str(tmpdir.join(name))
+    with open(filename, 'w') as f:
+        json.dump(post, f)
+    return filename
+
+
+def test_should_replace_property():
+    post = {'properties': {'content': ['hello']}}
+    post = apply_operations(post, [{
+        'action': 'update',
+        'replace': {'content': ['goodbye']}
+    }])
+    assert post['properties']['content'] == ['goodbye']
+
+
+def test_should_add_property_values():
+    post = {'properties': {'category': ['tag1']}}
+    post = apply_operations(post, [{
+        'action': 'update',
+        'add': {'category': ['tag2'], 'syndication': ['http://a.com']}
+    }])
+    assert post['properties']['category'] == ['tag1', 'tag2']
+    assert post['properties']['syndication'] == ['http://a.com']
+
+
+def test_should_delete_properties():
+    post = {'properties': {'category': ['tag1'], 'content': ['hello']}}
+    post = apply_operations(post, [{
+        'action': 'update',
+        'delete': ['category']
+    }])
+    assert post['properties'] == {'content': ['hello']}
+
+
+def test_should_delete_property_values():
+    post = {'properties': {'category': ['tag1', 'tag2']}}
+    post = apply_operations(post, [{
+        'action': 'update',
+        'delete': {'category': ['tag1']}
+    }])
+    assert post['properties']['category'] == ['tag2']
+
+
+def test_should_not_modify_base_entry():
+    post = {'properties': {'content': ['hello']}}
+    apply_operations(post, [{
+        'action': 'update',
+        'replace': {'content': ['goodbye']}
+    }])
+    assert post['properties']['content'] == ['hello']
+
+
+def test_should_delete_and_undelete():
+    post = {'properties': {}}
+    assert apply_operations(post, [{'action': 'delete'}])['deleted']
+    assert 'deleted' not in apply_operations(post, [
+        {'action': 'delete'}, {'action': 'undelete'}])
+
+
+def test_should_read_entry_with_operations(tmpdir):
+    filename = write_entry(tmpdir)
+    assert read_entry(filename)['properties']['content'] == ['hello']
+
+    append_operation(filename, {
+        'action': 'update',
+        'replace': {'content': ['goodbye']}
+    })
+    assert read_entry(filename)['properties']['content'] == ['goodbye']
+
+
+def test_should_compact_entry(tmpdir):
+    filename = write_entry(tmpdir)
+    append_operation(filename, {'action': 'update', 'delete': ['category']})
+    append_operation(filename, {'action': 'update', 'add': {'x': ['y']}})
+
+    assert compact(filename)
+    assert not os.path.exists(ops_path(filename))
+    with open(filename) as f:
+        post = json.load(f)
+    assert 'category' not in post['properties']
+    assert post['properties']['x'] == ['y']
+    assert read_entry(filename) == post
+
+
+def test_should_keep_operations_appended_during_compact(tmpdir, monkeypatch):
+    filename = write_entry(tmpdir)
+    append_operation(filename, {'action': 'update', 'add': {'x': ['y']}})
+    read_log = oplog.read_log
+
+    def read_log_then_append(path):
+        operations = read_log(path)
+        append_operation(filename, {'action': 'update',
+                                    'add': {'x': ['z']}})
+        return operations
+
+    monkeypatch.setattr(oplog, 'read_log', read_log_then_append)
+    assert compact(filename)
+    monkeypatch.undo()
+
+    with open(filename) as f:
+        assert json.load(f)['properties']['x'] == ['y']
+    assert len(oplog.read_operations(filename)) == 1
+    assert read_entry(filename)['properties']['x'] == ['y', 'z']
+
+
+def test_should_refuse_to_compact_over_interrupted_compaction(tmpdir):
+    filename = write_entry(tmpdir)
+    append_operation(filename, {'action': 'update', 'add': {'x': ['y']}})
+    tmpdir.join('entry.mp.ops.compacting').write('')
+    with pytest.raises(Exception):
+        compact(filename)
+    assert os.path.exists(ops_path(filename))
+
+
+def test_should_not_compact_entry_without_log(tmpdir):
+    filename = write_entry(tmpdir)
+    assert not compact(filename)
+
+
+def test_should_compact_tree(tmpdir):
+    first = write_entry(tmpdir, 'first.mp')
+    write_entry(tmpdir, 'second.mp')
+    append_operation(first, {'action': 'delete'})
+    assert compact_tree(str(tmpdir)) == [first]
@@ -0,0 +1,148 @@
+import copy
+import os
+import random
+import threading
+
+from pelican.generators import ArticlesGenerator
+from pelican.settings import DEFAULT_CONFIG
+
+import pelican_micropub.prefetch as prefetch
+from pelican_micropub.prefetch import Prefetcher, files_to_read, read_file
+from pelican_micropub.micropub import read_whole_file
+from pelican_micropub.readers import MicropubReader, NotedownReader
+
+
+def make_tree(tmpdir, count=20):
+    paths = []
+    for i in range(count):
+        directory = tmpdir.join('d%d' % (i % 3)).ensure(dir=True)
+        path = directory.join('%02d.nd' % i)
+        path.write('title: %d\n\nbody %d' % (i, i))
+        paths.append(str(path))
+    tmpdir.join('ignored.md').write('nope')
+    tmpdir.join('entry.mp').write('{}')
+    tmpdir.join('entry.mp.ops').write('{}')
+    return sorted(paths)
+
+
+def make_generator(tmpdir, **settings):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config['READERS'] = {'mp': MicropubReader, 'nd': NotedownReader}
+    config.update(settings)
+    return ArticlesGenerator(context={}, settings=config, path=str(tmpdir),
+                             theme=config['THEME'],
+                             output_path=str(tmpdir.join('output')))
+
+
+def test_should_list_files_in_generator_order(tmpdir):
+    make_tree(tmpdir)
+    generator = make_generator(tmpdir)
+    expected = [os.path.join(str(tmpdir), f)
+                for f in generator.get_files(['']) if f.endswith('.nd')]
+    listed = files_to_read(generator, [''], [])
+    assert expected
+    assert [path for path in listed if path.endswith('.nd')] == expected
+    assert str(tmpdir.join('entry.mp')) in listed
+    assert not any(path.endswith(('.md', '.ops')) for path in listed)
+
+
+def test_should_not_list_excluded_files(tmpdir):
+    make_tree(tmpdir)
+    generator = make_generator(tmpdir, ARTICLE_EXCLUDES=['d0'])
+    listed = files_to_read(generator, [''], ['d0'])
+    assert len(listed) == 20 - 7 + 1
+    assert not any(os.sep + 'd0' + os.sep in path for path in listed)
+
+
+def test_should_take_prefetched_files(tmpdir):
+    paths = make_tree(tmpdir)
+    prefetcher = Prefetcher(iter(paths), workers=4)
+    try:
+        prefetcher.thread.join(5)
+        for path in paths:
+            assert prefetcher.take(path) == read_file(path)
+        assert prefetcher.take(paths[0]) is None
+    finally:
+        prefetcher.close()
+
+
+def test_should_not_prefetch_files_already_taken(tmpdir):
+    paths = make_tree(tmpdir)
+    started = threading.Event()
+    read = []
+
+    def slow_read(path):
+        started.wait()
+        read.append(path)
+        return read_file(path)
+
+    prefetcher = Prefetcher(iter(paths), workers=1, max_files=1,
+                            read=slow_read)
+    try:
+        assert prefetcher.take(paths[-1]) is None
+        started.set()
+        for path in paths[:-1]:
+            contents = prefetcher.take(path)
+            assert contents is None or contents == read_file(path)
+        prefetcher.thread.join(5)
+        assert paths[-1] not in read
+    finally:
+        prefetcher.close()
+
+
+def test_should_respect_buffer_limits_in_any_order(tmpdir):
+    paths = make_tree(tmpdir)
+    buffered = []
+
+    def read(path):
+        buffered.append(len(prefetcher.pending))
+        return read_file(path)
+
+    prefetcher = Prefetcher(iter(paths), workers=2, max_files=3, read=read)
+    try:
+        shuffled = list(paths)
+        random.Random(1).shuffle(shuffled)
+        for path in shuffled:
+            contents = prefetcher.take(path)
+            assert contents is None or contents == read_file(path)
+        assert max(buffered, default=0) <= 3
+    finally:
+        prefetcher.close()
+
+
+def test_should_drop_files_passed_over(tmpdir):
+    paths = make_tree(tmpdir)
+    prefetcher = Prefetcher(paths, workers=2, max_files=3)
+    try:
+        # as if the other files were found in Pelican's content cache
+        for path in paths[::4] + [paths[-1]]:
+            contents = prefetcher.take(path)
+            assert contents is None or contents == read_file(path)
+        prefetcher.thread.join(5)
+        assert not prefetcher.thread.is_alive()
+        assert prefetcher.pending == {}
+    finally:
+        prefetcher.close()
+
+
+def test_should_release_discarded_files(tmpdir):
+    paths = make_tree(tmpdir, 2)
+    prefetcher = Prefetcher(iter(paths), workers=1, max_bytes=1)
+    try:
+        prefetcher.discard(paths[0])
+        assert prefetcher.take(paths[1]) in (None, read_file(paths[1]))
+        prefetcher.thread.join(1)
+        assert prefetcher.buffered_bytes == 0
+    finally:
+        prefetcher.close()
+
+
+def test_should_read_whole_file_from_prefetcher(tmpdir, monkeypatch):
+    paths = make_tree(tmpdir, 1)
+    prefetcher = Prefetcher(iter(paths), read=lambda p: 'prefetched')
+    monkeypatch.setitem(prefetch._active, 'test', prefetcher)
+    try:
+        assert read_whole_file(paths[0]) == 'prefetched'
+        assert read_whole_file(paths[0]) == read_file(paths[0])
+    finally:
+        prefetcher.close()
@@ -0,0 +1,212 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+from pelican_micropub.replycontext import parse_context, ContextCache, \
+    ContextFetcher, attach_reply_contexts
+
+
+entry_page = b'''<html>
+<head><title>Page title</title></head>
+<body>
+  <div class="h-entry">
+    <h1 class="p-name">Great post</h1>
+    <a class="p-author h-card" href="/">Jane Doe</a>
+    <div class="e-content"><p>Some <em>interesting</em> words.</p></div>
+  </div>
+</body>
+</html>'''
+
+meta_page = b'''<html>
+<head>
+  <title>Just a title</title>
+  <meta name="author" content="John Smith">
+  <meta property="og:description" content="A description">
+</head>
+<body><p>hello</p></body>
+</html>'''
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+
+    def do_GET(self):
+        Handler.hits[self.path] = Handler.hits.get(self.path, 0) + 1
+        if self.path == '/redirect':
+            self._send(301, b'', {'Location': '/entry'})
+        elif self.path == '/entry':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304, b'', {'ETag': '"v1"'})
+            else:
+                self._send(200, entry_page, {'ETag': '"v1"'})
+        elif self.path == '/meta':
+            self._send(200, meta_page, {})
+        elif self.path == '/bogus-charset':
+            self._send(200, entry_page, {},
+                       'text/html; charset=bogus-xyz')
+        else:
+            self._send(404, b'not found', {})
+
+    def _send(self, status, body, headers,
+              content_type='text/html; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.hits = {}
+    httpd = ThreadingServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class Article(object):
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class Generator(object):
+    def __init__(self, settings, articles):
+        self.settings = settings
+        self.articles = articles
+        self.translations = []
+        self.drafts = []
+        self.hidden_articles = []
+
+
+def test_should_parse_h_entry():
+    context = parse_context('http://example.com', entry_page.decode())
+    assert context == {
+        'url': 'http://example.com',
+        'name': 'Great post',
+        'author': 'Jane Doe',
+        'excerpt': 'Some interesting words.'
+    }
+
+
+def test_should_fall_back_to_html_metadata():
+    context = parse_context('http://example.com', meta_page.decode())
+    assert context['name'] == 'Just a title'
+    assert context['author'] == 'John Smith'
+    assert context['excerpt'] == 'A description'
+
+
+def test_should_truncate_excerpt():
+    context = parse_context('http://example.com', entry_page.decode(), 10)
+    assert context['excerpt'] == 'Some…'
+
+
+def test_should_fetch_contexts(server, tmpdir):
+    cache = ContextCache(str(tmpdir.join('cache.json')), 3600)
+    contexts = ContextFetcher(cache).fetch_all(
+        [server + '/entry', server + '/meta', server + '/missing'])
+    assert contexts[server + '/entry']['name'] == 'Great post'
+    assert contexts[server + '/meta']['author'] == 'John Smith'
+    assert server + '/missing' not in contexts
+
+
+def test_should_follow_redirects(server, tmpdir):
+    cache = ContextCache(str(tmpdir.join('cache.json')), 3600)
+    contexts = ContextFetcher(cache).fetch_all([server + '/redirect'])
+    assert contexts[server + '/redirect']['url'] == server + '/redirect'
+    assert contexts[server + '/redirect']['name'] == 'Great post'
+
+
+def test_should_not_refetch_fresh_contexts(server, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    ContextFetcher(ContextCache(path, 3600)).fetch_all([server + '/entry'])
+    contexts = ContextFetcher(ContextCache(path, 3600)).fetch_all(
+        [server + '/entry'])
+    assert Handler.hits['/entry'] == 1
+    assert contexts[server + '/entry']['name'] == 'Great post'
+
+
+def test_should_revalidate_stale_contexts(server, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    ContextFetcher(ContextCache(path, 0)).fetch_all([server + '/entry'])
+    cache = ContextCache(path, 0)
+    fetched = cache.get(server + '/entry')['fetched']
+    contexts = ContextFetcher(cache).fetch_all([server + '/entry'])
+    assert Handler.hits['/entry'] == 2
+    assert cache.get(server + '/entry')['fetched'] >= fetched
+    assert contexts[server + '/entry']['name'] == 'Great post'
+
+
+def test_should_fall_back_to_utf8_for_unknown_charset(server, tmpdir):
+    cache = ContextCache(str(tmpdir.join('cache.json')), 3600)
+    contexts = ContextFetcher(cache).fetch_all([server + '/bogus-charset'])
+    assert contexts[server + '/bogus-charset']['name'] == 'Great post'
+
+
+def test_should_survive_malformed_urls(server, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    contexts = ContextFetcher(ContextCache(path, 3600)).fetch_all(
+        ['http://example..com/x', server + '/entry'])
+    assert contexts[server + '/entry']['name'] == 'Great post'
+    cache = ContextCache(path, 3600)
+    assert cache.get('http://example..com/x')['failed'] is not None
+
+
+def test_should_not_refetch_recent_failures(server, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    ContextFetcher(ContextCache(path, 3600)).fetch_all([server + '/missing'])
+    contexts = ContextFetcher(ContextCache(path, 3600)).fetch_all(
+        [server + '/missing'])
+    assert Handler.hits['/missing'] == 1
+    assert contexts == {}
+
+
+def test_should_retry_failures_after_their_ttl(server, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    ContextFetcher(ContextCache(path, 3600, 0)).fetch_all(
+        [server + '/missing'])
+    ContextFetcher(ContextCache(path, 3600, 0)).fetch_all(
+        [server + '/missing'])
+    assert Handler.hits['/missing'] == 2
+
+
+def test_should_keep_stale_context_when_refetch_fails(tmpdir):
+    cache = ContextCache(None, 0, 3600)
+    cache.put('http://example.com', {'name': 'Old'}, None, None, 0)
+    cache.put_failure('http://example.com', 10)
+    assert cache.is_fresh('http://example.com', 20)
+    assert cache.get('http://example.com')['context'] == {'name': 'Old'}
+
+
+def test_should_attach_reply_contexts(server, tmpdir):
+    settings = {
+        'MICROPUB_REPLY_CONTEXT': True,
+        'MICROPUB_REPLY_CONTEXT_CACHE': str(tmpdir.join('cache.json')),
+        'WEBMENTIONS_CONTENT_HEADERS': ['in_reply_to', 'like_of']
+    }
+    article = Article({'in_reply_to': [server + '/entry'], 'like_of': []})
+    attach_reply_contexts(Generator(settings, [article]))
+    assert article.reply_context['in_reply_to'][0]['name'] == 'Great post'
+    assert 'like_of' not in article.reply_context
+    assert article.metadata['reply_context'] is article.reply_context
+
+
+def test_should_not_attach_reply_contexts_unless_enabled(server):
+    article = Article({'in_reply_to': [server + '/entry']})
+    attach_reply_contexts(Generator({}, [article]))
+    assert not hasattr(article, 'reply_context')
+    assert Handler.hits == {}
@@ -0,0 +1,77 @@
+from pelican_micropub.sanitize import Policy, SanitizeCache, sanitize, \
+    sanitize_html
+from pelican_micropub.micropub import micropub2pelican
+
+
+def test_should_keep_allowed_markup():
+    html = '<p class="x">hello <a href="http://a.com" rel="me">you</a></p>'
+    assert sanitize(html, Policy()) == html
+
+
+def test_should_strip_disallowed_tags_but_keep_text():
+    assert sanitize('<p><blink>hi</blink></p>', Policy()) == '<p>hi</p>'
+
+
+def test_should_drop_scripts_entirely():
+    html = '<p>hi<script>alert("x")</script></p><style>p {}</style>'
+    assert sanitize(html, Policy()) == '<p>hi</p>'
+
+
+def test_should_strip_disallowed_attributes():
+    html = '<p onclick="evil()" style="color: red">hi</p>'
+    assert sanitize(html, Policy()) == '<p>hi</p>'
+
+
+def test_should_strip_disallowed_protocols():
+    html = '<a href="java\tscript:alert(1)">x</a><img src="/a.png">'
+    assert sanitize(html, Policy()) == '<a>x</a><img src="/a.png">'
+
+
+def test_should_escape_text_and_attributes():
+    html = '<p title="&quot;&gt;">1 &lt; 2</p>'
+    assert sanitize(html, Policy()) == '<p title="&quot;&gt;">1 &lt; 2</p>'
+
+
+def test_should_close_unclosed_tags():
+    assert sanitize('<p><em>hi</p>', Policy()) == '<p><em>hi</em></p>'
+    assert sanitize('<ul><li>hi', Policy()) == '<ul><li>hi</li></ul>'
+
+
+def test_should_obey_custom_policy():
+    policy = Policy(['p'], {'p': ['id']}, [])
+    assert sanitize('<p id="x" class="y"><b>hi</b></p>', policy) == \
+        '<p id="x">hi</p>'
+
+
+def test_should_cache_by_content():
+    cache = SanitizeCache(maxsize=1)
+    policy = Policy()
+    first = cache.sanitize('<p>hi</p>', policy)
+    assert cache.sanitize('<p>hi</p>', policy) is first
+    cache.sanitize('<p>bye</p>', policy)
+    assert len(cache.entries) == 1
+
+
+def test_should_not_evict_by_default():
+    cache = SanitizeCache()
+    policy = Policy()
+    for i in range(5000):
+        cache.sanitize(f'<p>{i}</p>', policy)
+    assert len(cache.entries) == 5000
+
+
+def test_should_not_sanitize_unless_enabled():
+    assert sanitize_html('<script>x</script>', {}) == '<script>x</script>'
+
+
+def test_should_sanitize_micropub_html():
+    post = {
+        "type": ["h-entry"],
+        "properties": {
+            "content": [{'html': '<p onclick="x()">hello</p>'}],
+            "published": ["2019-08-29T02:03:05.429827"]
+        }
+    }
+    settings = {'MICROPUB_SANITIZE_HTML': True}
+    html, metadata = micropub2pelican(post, settings)
+    assert html == '<p>hello</p>'
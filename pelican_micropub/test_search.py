@@ -0,0 +1,134 @@
+import json
+import os
+
+from pelican_micropub.search import tokenize, html2text, SearchIndex
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_should_tokenize():
+    assert tokenize('The Café is OPEN, and a dog is in it') == \
+        ['cafe', 'open', 'dog']
+
+
+def test_should_strip_html():
+    assert html2text('<p>fish &amp; <em>chips</em></p>').split() == \
+        ['fish', '&', 'chips']
+
+
+def test_should_write_shards(tmpdir):
+    index = SearchIndex()
+    index.add('a.mp', '/a', 'Hello', '<p>hello world</p>')
+    index.add('b.mp', '/b', '', 'world peace')
+    out = str(tmpdir.join('search'))
+    written = index.write(out)
+
+    assert sorted(written) == ['docs/0.json', 'he.json', 'index.json',
+                               'pe.json', 'wo.json']
+    assert read_json(os.path.join(out, 'he.json')) == {'hello': [0, 2]}
+    assert read_json(os.path.join(out, 'wo.json')) == {'world': [0, 1, 1, 1]}
+    assert read_json(os.path.join(out, 'docs', '0.json')) == \
+        {'0': ['/a', 'Hello'], '1': ['/b', '']}
+    assert read_json(os.path.join(out, 'index.json')) == \
+        {'prefix_length': 2, 'docs_per_shard': 500,
+         'shards': ['he', 'pe', 'wo'], 'doc_shards': [0]}
+
+
+def test_should_only_reindex_changed_documents(tmpdir):
+    state = str(tmpdir.join('state.json'))
+    out = str(tmpdir.join('search'))
+    index = SearchIndex(state)
+    index.add('a.mp', '/a', '', 'hello world')
+    index.add('b.mp', '/b', '', 'peace')
+    index.prune()
+    index.write(out)
+    index.save()
+
+    index = SearchIndex(state)
+    assert not index.add('a.mp', '/a', '', 'hello world')
+    assert index.add('b.mp', '/b', '', 'quiet')
+    index.prune()
+    written = index.write(out)
+
+    assert sorted(written) == ['docs/0.json', 'index.json', 'qu.json']
+    assert not os.path.exists(os.path.join(out, 'pe.json'))
+    assert read_json(os.path.join(out, 'qu.json')) == {'quiet': [1, 1]}
+
+
+def test_should_prune_removed_documents(tmpdir):
+    state = str(tmpdir.join('state.json'))
+    out = str(tmpdir.join('search'))
+    index = SearchIndex(state)
+    index.add('a.mp', '/a', '', 'hello world')
+    index.add('b.mp', '/b', '', 'world')
+    index.write(out)
+    index.save()
+
+    index = SearchIndex(state)
+    index.add('b.mp', '/b', '', 'world')
+    index.prune()
+    written = index.write(out)
+
+    assert sorted(written) == ['docs/0.json', 'index.json', 'wo.json']
+    assert not os.path.exists(os.path.join(out, 'he.json'))
+    assert read_json(os.path.join(out, 'wo.json')) == {'world': [1, 1]}
+    assert read_json(os.path.join(out, 'docs', '0.json')) == \
+        {'1': ['/b', '']}
+
+
+def test_should_rewrite_missing_shards(tmpdir):
+    state = str(tmpdir.join('state.json'))
+    index = SearchIndex(state)
+    index.add('a.mp', '/a', '', 'hello')
+    index.write(str(tmpdir.join('first')))
+    index.save()
+
+    index = SearchIndex(state)
+    index.add('a.mp', '/a', '', 'hello')
+    written = index.write(str(tmpdir.join('second')))
+    assert sorted(written) == ['docs/0.json', 'he.json', 'index.json']
+
+
+def test_should_shard_documents_by_id(tmpdir):
+    state = str(tmpdir.join('state.json'))
+    out = str(tmpdir.join('search'))
+    index = SearchIndex(state, docs_per_shard=2)
+    for name in 'abc':
+        index.add(name + '.mp', '/' + name, '', 'hello')
+    index.write(out)
+    index.save()
+
+    assert read_json(os.path.join(out, 'docs', '1.json')) == \
+        {'2': ['/c', '']}
+    assert read_json(os.path.join(out, 'index.json'))['doc_shards'] == [0, 1]
+
+    index = SearchIndex(state, docs_per_shard=2)
+    index.add('a.mp', '/a', '', 'hello')
+    index.add('b.mp', '/b', '', 'hello')
+    index.prune()
+    written = index.write(out)
+
+    assert sorted(written) == ['he.json', 'index.json']
+    assert not os.path.exists(os.path.join(out, 'docs', '1.json'))
+    assert read_json(os.path.join(out, 'index.json'))['doc_shards'] == [0]
+
+
+def test_should_truncate_titles(tmpdir):
+    index = SearchIndex(title_length=10)
+    index.add('a.mp', '/a', 'a note with no title', 'a note with no title')
+    out = str(tmpdir.join('search'))
+    index.write(out)
+    assert read_json(os.path.join(out, 'docs', '0.json')) == \
+        {'0': ['/a', 'a note…']}
+    assert read_json(os.path.join(out, 'ti.json')) == {'title': [0, 2]}
+
+
+def test_should_ignore_corrupt_state(tmpdir):
+    state = tmpdir.join('state.json')
+    state.write('{"prefix_length": 2, "docs')
+    index = SearchIndex(str(state))
+    assert index.add('a.mp', '/a', '', 'hello')
+    assert index.docs['a.mp']['id'] == 0
@@ -0,0 +1,144 @@
+import copy
+import gc
+import json
+import os
+import pickle
+import tracemalloc
+from types import SimpleNamespace
+
+from pelican.contents import Article
+from pelican.settings import DEFAULT_CONFIG
+
+from pelican_micropub.readers import MicropubReader
+from pelican_micropub.spill import BodyStore, spill, attach_spilled_content, \
+    get_body, collect_spilled_content, prune_spilled_content
+
+
+def make_settings(tmpdir):
+    settings = copy.deepcopy(DEFAULT_CONFIG)
+    settings['MICROPUB_SPILL_CONTENT'] = True
+    settings['MICROPUB_SPILL_PATH'] = str(tmpdir.join('bodies'))
+    return settings
+
+
+def make_article(tmpdir, body):
+    settings = make_settings(tmpdir)
+    html, metadata = spill(body, {'title': 'hi'}, settings)
+    article = Article(html, metadata, settings)
+    attach_spilled_content(article)
+    return article
+
+
+def test_should_store_bodies_by_hash(tmpdir):
+    store = BodyStore(str(tmpdir))
+    key = store.put('<p>hello</p>')
+    assert store.put('<p>hello</p>') == key
+    assert store.get(key) == '<p>hello</p>'
+
+
+def test_should_prune_bodies(tmpdir):
+    store = BodyStore(str(tmpdir))
+    keep = store.put('<p>hello</p>')
+    drop = store.put('<p>bye</p>')
+    store.prune({keep})
+    assert store.get(keep) == '<p>hello</p>'
+    assert not os.path.exists(store._path(drop))
+    assert sorted(os.listdir(str(tmpdir))) == [keep[:2]]
+
+
+def test_should_prune_bodies_no_content_refers_to(tmpdir):
+    settings = make_settings(tmpdir)
+    article = make_article(tmpdir, '<p>hello</p>')
+    orphan = make_article(tmpdir, '<p>bye</p>')
+    generator = SimpleNamespace(settings=settings, articles=[article],
+                                translations=[])
+    collect_spilled_content(generator)
+    prune_spilled_content(SimpleNamespace(settings=settings))
+
+    assert article.content == '<p>hello</p>'
+    store = BodyStore(settings['MICROPUB_SPILL_PATH'])
+    assert not os.path.exists(
+        store._path(orphan.metadata['spilled_content']))
+
+
+def test_should_not_spill_unless_enabled(tmpdir):
+    assert spill('<p>hello</p>', {}, {}) == ('<p>hello</p>', {})
+
+
+def test_should_spill_body(tmpdir):
+    html, metadata = spill('<p>hello</p>', {}, make_settings(tmpdir))
+    assert html == ''
+    assert BodyStore(str(tmpdir.join('bodies'))).get(
+        metadata['spilled_content']) == '<p>hello</p>'
+
+
+def test_should_load_spilled_content_lazily(tmpdir):
+    article = make_article(tmpdir, '<p>hello</p>')
+    assert article._content == ''
+    assert article.content == '<p>hello</p>'
+    assert get_body(article) == '<p>hello</p>'
+
+
+def test_should_not_memoize_spilled_content(tmpdir):
+    article = make_article(tmpdir, '<p>hello</p>')
+    assert article.content == '<p>hello</p>'
+    assert not any(args[0] is article
+                   for args in Article.get_content.cache)
+
+
+def test_should_pickle_spilled_article(tmpdir):
+    article = pickle.loads(pickle.dumps(make_article(tmpdir, '<p>hi</p>')))
+    assert article.content == '<p>hi</p>'
+
+
+def test_should_leave_other_content_alone(tmpdir):
+    article = Article('<p>hello</p>', {'title': 'hi'},
+                      copy.deepcopy(DEFAULT_CONFIG))
+    attach_spilled_content(article)
+    assert article.content == '<p>hello</p>'
+    assert get_body(article) == '<p>hello</p>'
+
+
+def test_should_truncate_title(tmpdir):
+    settings = make_settings(tmpdir)
+    settings['MICROPUB_SPILL_TITLE_LENGTH'] = 10
+    html, metadata = spill('<p>hi</p>', {'title': 'hello there you all'},
+                           settings)
+    assert metadata['title'] == 'hello…'
+
+
+def test_should_not_retain_bodies(tmpdir):
+    settings = make_settings(tmpdir)
+    # none of these should get to keep the posts around
+    settings['MICROPUB_SHARE_ENTRIES'] = True
+    settings['MICROPUB_SANITIZE_HTML'] = True
+
+    filenames = []
+    total = 0
+    for i in range(40):
+        content = ' '.join(f'word{i}x{j}' for j in range(5000))
+        total += len(content)
+        filename = str(tmpdir.join(f'{i}.mp'))
+        with open(filename, 'w') as f:
+            json.dump({
+                "type": ["h-entry"],
+                "properties": {
+                    "content": [content],
+                    "published": ["2019-08-29T02:03:05.429827"]
+                }
+            }, f)
+        filenames.append(filename)
+
+    reader = MicropubReader(settings)
+    reader.read(filenames[0])
+    gc.collect()
+    tracemalloc.start()
+    try:
+        results = [reader.read(filename) for filename in filenames]
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert len(results) == len(filenames)
+    assert retained < total / 20
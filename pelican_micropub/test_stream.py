@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+from pelican_micropub.stream import iter_paths, iter_entries
+
+
+def write_note(directory, name, content):
+    post = {
+        "type": ["h-entry"],
+        "properties": {
+            "content": [content],
+            "published": ["2019-08-29T02:03:05.429827"]
+        }
+    }
+    directory.join(name).write(json.dumps(post))
+
+
+def make_tree(tmpdir):
+    write_note(tmpdir, 'a.mp', 'first #one')
+    write_note(tmpdir.mkdir('sub'), 'b.mp', 'second')
+    tmpdir.join('c.nd').write('title: Third\n\nthird *post*')
+    tmpdir.join('ignored.md').write('not an entry')
+    tmpdir.join('d.mp').write('not json')
+    return tmpdir
+
+
+def test_should_find_entry_files(tmpdir):
+    make_tree(tmpdir)
+    paths = list(iter_paths(str(tmpdir)))
+    assert paths == [str(tmpdir.join(p)) for p in
+                     ['a.mp', 'c.nd', 'd.mp', 'sub/b.mp']]
+
+
+def test_should_accept_list_of_paths(tmpdir):
+    make_tree(tmpdir)
+    paths = [str(tmpdir.join('a.mp')), str(tmpdir.join('ignored.md'))]
+    assert list(iter_paths(paths)) == [str(tmpdir.join('a.mp'))]
+
+
+def test_should_parse_entries(tmpdir):
+    make_tree(tmpdir)
+    entries = list(iter_entries(str(tmpdir)))
+    assert [e.path for e in entries] == \
+        [str(tmpdir.join(p)) for p in ['a.mp', 'c.nd', 'sub/b.mp']]
+
+    path, html, metadata = entries[0]
+    assert html == 'first #one'
+    assert metadata['title'] == 'first #one'
+    assert metadata['hashtags'] == ['one']
+    assert entries[1].metadata['title'] == 'Third'
+    assert entries[1].metadata['post_type'] == 'article'
+
+
+def test_should_parse_entries_with_settings(tmpdir):
+    make_tree(tmpdir)
+    settings = {'MICROPUB_CATEGORY_MAP': {'note': 'notes'}}
+    entries = list(iter_entries(str(tmpdir), settings))
+    assert entries[0].metadata['category'] == 'notes'
+
+
+def test_should_parse_entries_in_order_with_workers(tmpdir):
+    make_tree(tmpdir)
+    serial = list(iter_entries(str(tmpdir)))
+    parallel = list(iter_entries(str(tmpdir), workers=2))
+    assert parallel == serial
+
+
+def test_should_parse_entries_unordered_with_workers(tmpdir):
+    make_tree(tmpdir)
+    serial = list(iter_entries(str(tmpdir)))
+    parallel = list(iter_entries(str(tmpdir), workers=2, ordered=False))
+    assert sorted(parallel) == sorted(serial)
+
+
+def test_should_not_import_pelican():
+    code = 'import sys, pelican_micropub.stream; ' + \
+        'sys.exit("pelican" in sys.modules)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.call([sys.executable, '-c', code], cwd=root) == 0
@@ -17,7 +17,7 @@ DESCRIPTION = 'A pelican plugin to read micropub entries in json form'
 URL = 'https://github.com/drivet/pelian-micropub'
 EMAIL = 'desmond.rivet@gmail.com'
 AUTHOR = 'Desmond Rivet'
-REQUIRES_PYTHON = '>=3.6.0'
+REQUIRES_PYTHON = '>=3.7.0'
 VERSION = '0.1.0'
 
 # What packages are required for this module to be executed?
@@ -27,7 +27,7 @@ REQUIRED = [
 
 # What packages are optional?
 EXTRAS = {
-    'dev': ['twine', 'nose', 'invoke', 'jedi', 'rope',
+    'dev': ['twine', 'pytest', 'invoke', 'jedi', 'rope',
             'flake8', 'autopep8', 'yapf', 'black']
 }
 
@@ -122,7 +122,7 @@ setup(
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: Implementation :: CPython',
         'Programming Language :: Python :: Implementation :: PyPy'
     ],